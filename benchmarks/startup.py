@@ -0,0 +1,132 @@
+"""Interpreter-to-first-check latency of each lab's autograder.
+
+Runs every lab's ``autograder.py`` on its fast-fail path: an empty workspace
+and a ``terraform`` on PATH that exits 1 at once.  This is the path a broken
+submission takes, so the time until the first result reaches
+``evaluate.ndjson`` is nearly all interpreter start-up and imports.  Each lab
+is run several times and the median is reported, together with the heavy
+modules (boto3, botocore, requests) the run imported; on this path it should
+import none of them.
+
+    python3 benchmarks/startup.py [--runs N] [--labs lab1 lab3] [--json FILE]
+
+``--json`` appends one record per lab to FILE, so numbers can be tracked
+across commits.
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LABS = ["lab1", "lab2", "lab3"]
+HEAVY_MODULES = ("boto3", "botocore", "requests")
+
+
+def _parse_time(value):
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _imported(importtime_log, names):
+    found = set()
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        module = line.rsplit("|", 1)[-1].strip()
+        if module.split(".")[0] in names:
+            found.add(module.split(".")[0])
+    return sorted(found)
+
+
+def run_once(lab, bin_dir):
+    script = os.path.join(REPO, lab, ".evaluationScripts", "autograder", "autograder.py")
+    workdir = tempfile.mkdtemp(prefix=f"startup-{lab}-")
+    workspace = os.path.join(workdir, "autograder")
+    os.mkdir(workspace)
+    env = dict(
+        os.environ,
+        PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""),
+        GRADER_EVALUATE_PATH=os.path.join(workdir, "evaluate.json"),
+    )
+    env.pop("GRADER_EKS_POOL", None)
+    try:
+        started = time.time()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", script],
+            cwd=workspace,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        finished = time.time()
+
+        first_result = None
+        log_path = os.path.join(workdir, "evaluate.ndjson")
+        if os.path.exists(log_path):
+            with open(log_path) as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["type"] == "result":
+                        first_result = _parse_time(record["time"])
+                        break
+        if first_result is None:
+            errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+            raise RuntimeError(f"{lab} wrote no results (exit status {proc.returncode}): {errors[-1] if errors else ''}")
+        return first_result - started, finished - started, _imported(proc.stderr, HEAVY_MODULES)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--labs", nargs="+", default=LABS, choices=LABS)
+    parser.add_argument("--json", help="append one JSON record per lab to this file")
+    args = parser.parse_args(argv)
+
+    bin_dir = tempfile.mkdtemp(prefix="startup-bin-")
+    terraform = os.path.join(bin_dir, "terraform")
+    with open(terraform, 'w') as f:
+        f.write("#!/bin/sh\nexit 1\n")
+    os.chmod(terraform, 0o755)
+
+    records = []
+    try:
+        print(f"{'lab':<6}{'first check (ms)':>18}{'total (ms)':>12}  heavy imports")
+        for lab in args.labs:
+            firsts, totals, imported = [], [], set()
+            for _ in range(args.runs):
+                first, total, modules = run_once(lab, bin_dir)
+                firsts.append(first)
+                totals.append(total)
+                imported.update(modules)
+            record = {
+                "lab": lab,
+                "runs": args.runs,
+                "first_check_ms": round(statistics.median(firsts) * 1000, 1),
+                "total_ms": round(statistics.median(totals) * 1000, 1),
+                "heavy_imports": sorted(imported),
+                "python": sys.version.split()[0],
+                "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            }
+            records.append(record)
+            print(f"{lab:<6}{record['first_check_ms']:>18.1f}{record['total_ms']:>12.1f}  {', '.join(record['heavy_imports']) or 'none'}")
+    finally:
+        shutil.rmtree(bin_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""Helpers shared by the lab autograders.
+
+Each lab ships its own copy of this package next to ``autograder.py``.  Edit
+lab1's copy; ``python3 tools/grading_copies.py sync`` copies it to lab2 and
+lab3, and ``check`` fails if the copies differ.
+"""
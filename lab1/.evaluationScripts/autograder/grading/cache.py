@@ -0,0 +1,58 @@
+"""Per-run memoization of read-only AWS API calls.
+
+:class:`CachingClient` wraps a boto3 client.  ``describe_*``, ``list_*`` and
+``get_*`` calls are answered from a cache keyed by operation name and
+parameters, so the same resource is only fetched once per grade no matter
+how many checks (or helpers such as ``eks_pool``) ask for it.  Any other call
+is treated as a write and clears the cache, and code that polls for a state
+change calls :meth:`invalidate` before every poll.
+"""
+import copy
+import json
+import threading
+
+READ_PREFIXES = ("describe_", "list_", "get_")
+PASSTHROUGH = {"get_paginator", "get_waiter", "can_paginate"}
+
+
+class CachingClient:
+    def __init__(self, client):
+        self._client = client
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hits = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name in PASSTHROUGH:
+            return attr
+        if not name.startswith(READ_PREFIXES):
+            def write(**kwargs):
+                self.invalidate()
+                with self._lock:
+                    self.calls += 1
+                return attr(**kwargs)
+            return write
+
+        def read(**kwargs):
+            key = (name, json.dumps(kwargs, sort_keys=True, default=str))
+            with self._lock:
+                if key in self._cache:
+                    self.hits += 1
+                    return copy.deepcopy(self._cache[key])
+            response = attr(**kwargs)
+            with self._lock:
+                self.calls += 1
+                self._cache[key] = response
+            return copy.deepcopy(response)
+        return read
+
+    def invalidate(self, operation=None):
+        """Forget cached responses, for one operation or all of them."""
+        with self._lock:
+            if operation is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[0] == operation]:
+                    del self._cache[key]
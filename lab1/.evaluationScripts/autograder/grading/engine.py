@@ -0,0 +1,594 @@
+"""Grading engine: runs a lab spec from Terraform setup to evaluate.json.
+
+A lab's ``autograder.py`` builds a :class:`Lab` and calls :func:`main`.  The
+engine runs (or only reads) the Terraform setup, prefetches every resource
+the checks declare with one batched call per resource type, evaluates the
+checks in order and writes skip results for checks whose setup or
+prerequisites failed.  Results stream through ``grading.results`` and the
+whole run is bounded by ``grading.timeouts``.
+
+Before the first check runs, :func:`snapshot` waits for resources in a
+transitional state (a pending instance, an updating cluster) to settle and
+then freezes the fetched resources, so every check judges the same
+point-in-time view rather than whatever state each resource was in when it
+happened to be fetched.
+
+With ``GRADER_DRIFT_CHECK=1`` a lab that applies the submission runs one
+refresh-only ``terraform plan`` after the apply.  If it finds no drift, the
+live infrastructure is what was just applied, and the checks read their
+resources from the refreshed state instead of calling ``describe_*``.  On
+drift or a plan error they fall back to the AWS API.
+
+With ``GRADER_PIPELINE=1`` the apply is watched through ``grading.pipeline``
+and checks start as soon as their resources are created.  Results that
+passed early are reused if the snapshot froze the very fetches they judged;
+the rest run against the snapshot as usual.
+
+Every completed stage is saved through ``grading.checkpoint``, so a run
+that crashed (or whose container restarted) resumes from its last
+checkpoint instead of provisioning again.  :func:`speculate` runs the same
+setup stages ahead of time for ``grading.watch``, plus a plan whose saved
+file the grading run then applies.
+
+boto3 is only imported when the first client is built.  Importing it costs
+more than the rest of the grader put together, and a run that fails in
+Terraform setup never talks to AWS at all.
+"""
+import os
+import subprocess
+import threading
+import time
+
+from . import cache, checkpoint, checks, config, fetch, history, janitor, metrics, pipeline, profiling, results, tags, terraform, timeouts, watch
+
+SETUP_TESTID = "Terraform Setup Verification"
+
+# Saved by a speculative run, applied by the grading run that resumes it
+SPECULATIVE_PLAN = "grader-speculative.tfplan"
+
+# Seconds the sweep after evaluate.sh's destroy may spend; it does not wait
+# for deletions to complete, so anything with dependents is left to a later sweep
+SWEEP_BUDGET = 30
+
+# Default "snapshot" stage budget, and how often unsettled resources are re-fetched
+SNAPSHOT_BUDGET = 120
+SNAPSHOT_POLL_SECONDS = 5
+
+
+def tfvars_credentials(tfvars):
+    """Session arguments for labs where the student's tfvars hold the credentials."""
+    return {
+        "aws_access_key_id": tfvars.get("access_key_value"),
+        "aws_secret_access_key": tfvars.get("secret_key_value"),
+        "region_name": tfvars.get("region_value"),
+    }
+
+
+def provider_region(default):
+    """Session arguments for labs that use the container's AWS credentials.
+
+    The region is the one the student's provider block names, or ``default``.
+    """
+    return lambda tfvars: {"region_name": config.load().provider_region or default}
+
+
+class Lab:
+    def __init__(self, name, checks, outputs, variables=(), apply=False, report_setup=False, budget=900, stage_budgets=None, aws=None, sweep_orphans=False, evaluate_path="../evaluate.json"):
+        self.name = name
+        self.checks = checks
+        self.outputs = list(outputs)
+        self.variables = list(variables)
+        self.apply = apply
+        self.report_setup = report_setup
+        self.budget = int(os.environ.get("GRADER_BUDGET", budget))
+        self.stage_budgets = stage_budgets or {}
+        self.aws = aws or (lambda tfvars: {})
+        self.sweep_orphans = sweep_orphans
+        self.evaluate_path = os.environ.get("GRADER_EVALUATE_PATH", evaluate_path)
+
+    def testids(self):
+        return [testid for testid, _ in self.marks()]
+
+    def marks(self):
+        """(testid, maximum marks) of every expected result, in order."""
+        marks = [(SETUP_TESTID, 1)] if self.report_setup else []
+        return marks + [(check.testid, check.marks) for check in self.checks]
+
+
+class Context:
+    """Everything a predicate may need: outputs, variables, clients, resources."""
+
+    def __init__(self, lab, outputs, tfvars, deadline):
+        self.lab = lab
+        self.outputs = outputs
+        self.tfvars = tfvars
+        self.deadline = deadline
+        self.stage_budgets = lab.stage_budgets
+        self.session_kwargs = lab.aws(tfvars)
+        # Refreshed Terraform state ({type: [values]}) when the drift check
+        # passed; resources are then read from it instead of the AWS API
+        self.state = None
+        self.resources = {}
+        # (type, ID) -> time.time() of the fetch; set once the snapshot is frozen
+        self.fetched_at = {}
+        self.snapshot_at = None
+        # Result position (seq, from 1) -> (seconds, AWS calls) for the grading
+        # history; by position, since a testid may repeat
+        self.check_stats = {}
+        # str(index) -> (passed, message, seconds, judged) of checks that passed
+        # while terraform apply was still running; by position, like check_stats
+        self.early_results = {}
+        # Where completed stages and check results are saved; setup() passes
+        # the run's checkpoint, the default only lives in memory
+        self.checkpoint = checkpoint.Checkpoint(None, {"stages": {}, "checks": {}})
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, service):
+        """Return the run's client for a service; read calls are memoized."""
+        with self._lock:
+            if service not in self._clients:
+                import boto3
+                client = boto3.client(service, config=timeouts.aws_config(), **self.session_kwargs)
+                metrics.instrument(client.meta.events)
+                self._clients[service] = cache.CachingClient(client)
+            return self._clients[service]
+
+    def aws_calls(self):
+        """AWS API calls made so far and calls answered from the cache."""
+        with self._lock:
+            clients = list(self._clients.values())
+        return sum(c.calls for c in clients), sum(c.hits for c in clients)
+
+    def invalidate(self, resource_type=None, resource_id=None):
+        """Forget fetched resources (of one type, or one resource) before polling for a change.
+
+        Once the snapshot is frozen only the API caches are cleared; the
+        resources the checks judge stay as they were captured.
+        """
+        with self._lock:
+            # A poll wants the live value, which the state no longer proves
+            self.state = None
+            if self.snapshot_at is None:
+                for key in [key for key in self.resources if resource_type in (None, key[0]) and resource_id in (None, key[1])]:
+                    del self.resources[key]
+                    self.fetched_at.pop(key, None)
+            for client in self._clients.values():
+                client.invalidate()
+
+    def unsettled(self):
+        """Keys of fetched resources that are still in a transitional state."""
+        with self._lock:
+            items = list(self.resources.items())
+        return [key for key, value in items if isinstance(value, dict) and fetch.settling(key[0], value)]
+
+    def freeze(self):
+        self.snapshot_at = time.time()
+
+    def prefetch(self, resource_type, ids):
+        """Fetch many resources of one type, batched; errors are stored per ID."""
+        ids = [i for i in dict.fromkeys(ids) if i is not None and (resource_type, i) not in self.resources]
+        if not ids:
+            return
+        fetcher = fetch.FETCHERS[resource_type]
+        if self.state is not None:
+            fetcher = fetch.STATE_FETCHERS.get(resource_type, fetcher)
+        try:
+            found = fetcher(self, ids)
+        except Exception as e:
+            if len(ids) == 1:
+                found = {ids[0]: e}
+            else:
+                # One bad ID fails the whole batch; retry one by one so that
+                # only the checks using that ID fail
+                for i in ids:
+                    self.prefetch(resource_type, [i])
+                return
+        fetched_at = time.time()
+        for i in ids:
+            self.resources[(resource_type, i)] = found.get(i, LookupError(f"{resource_type} {i} was not found"))
+            self.fetched_at[(resource_type, i)] = fetched_at
+
+    def get(self, resource_type, resource_id):
+        if resource_id is None:
+            raise LookupError(f"No {resource_type} ID is available")
+        if (resource_type, resource_id) not in self.resources:
+            self.prefetch(resource_type, [resource_id])
+        value = self.resources[(resource_type, resource_id)]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def make_result(testid, passed=False, message="", marks=1):
+    return {
+        "testid": testid,
+        "status": "success" if passed else "failure",
+        "score": marks if passed else 0,
+        "maximum marks": marks,
+        "message": message
+    }
+
+
+def skip_result(check, reason, failed=None):
+    message = check.skipped.get(failed) or f"{reason} {check.label} verification skipped."
+    return make_result(check.testid, message=message, marks=check.marks)
+
+
+def drift_checked_state(lab, deadline):
+    """The refreshed state if a refresh-only plan finds no drift, else None."""
+    try:
+        in_sync, state = terraform.refresh_state(deadline, lab.stage_budgets)
+    except (subprocess.CalledProcessError, ValueError) as e:
+        metrics.inc("grader_drift_checks_total", {"result": "error"})
+        print(f"Drift check failed, verifying through the AWS API: {e}")
+        return None
+    except timeouts.StageTimeout as e:
+        # Only a spent lab budget cancels the run; the plan is optional
+        if deadline.remaining() <= 0:
+            raise
+        metrics.inc("grader_drift_checks_total", {"result": "error"})
+        print(f"Drift check failed, verifying through the AWS API: {e.reason}")
+        return None
+    metrics.inc("grader_drift_checks_total", {"result": "in_sync" if in_sync else "drift"})
+    if not in_sync:
+        print("The infrastructure drifted after terraform apply, verifying through the AWS API.")
+        return None
+    return state
+
+
+def setup(lab, data, deadline, ckpt):
+    """Run or read the Terraform setup; returns a Context, or None on failure.
+
+    Stages the checkpoint records as done are not run again.
+    """
+    result = make_result(SETUP_TESTID)
+    outputs, tfvars = {}, {}
+    context, state = None, None
+    early_context = None
+    try:
+        # Catch missing or mistyped variables before spending an apply on them.
+        # A lab that reads the applied state only warns: Terraform accepted
+        # the variables when the student applied
+        lab_config = config.load()
+        if lab.apply:
+            lab_config.validate()
+        else:
+            try:
+                lab_config.validate()
+            except config.ConfigError as e:
+                print(f"Warning: {e}")
+        tfvars = lab_config.variables
+        for warning in lab_config.warnings:
+            print(f"Warning: {warning}")
+
+        if lab.apply:
+            if not ckpt.done("apply"):
+                # Tag everything this run provisions so the janitor can find it later
+                tags.write_override(lab.name)
+
+            if not ckpt.done("init"):
+                timeouts.run(["terraform", "init"], deadline, "terraform init", lab.stage_budgets.get("init"), check=True)
+                ckpt.mark("init")
+
+            # Destroy any existing Terraform infrastructure. A resumed run
+            # skips this, so an interrupted apply continues where it stopped
+            if not ckpt.done("destroy"):
+                timeouts.run(["terraform", "destroy", "-auto-approve"], deadline, "terraform destroy", lab.stage_budgets.get("destroy"), check=True)
+                ckpt.mark("destroy")
+
+            # A speculative run leaves a saved plan; applying it skips planning again
+            plan_file = (ckpt.stage("plan") or {}).get("file")
+            if ckpt.done("apply"):
+                pass
+            elif os.environ.get("GRADER_PIPELINE") == "1":
+                early_context = Context(lab, pipeline.PendingOutputs(lab.outputs), tfvars, deadline)
+                early_context.early_results = pipeline.apply(lab, early_context, deadline, plan_file)
+                ckpt.mark("apply", {"early_results": early_context.early_results})
+            else:
+                timeouts.run(["terraform", "apply", "-auto-approve"] + ([plan_file] if plan_file else []), deadline, "terraform apply", lab.stage_budgets.get("apply"), check=True)
+                ckpt.mark("apply", {"early_results": {}})
+
+            if os.environ.get("GRADER_DRIFT_CHECK") == "1":
+                state = drift_checked_state(lab, deadline)
+
+        outputs = terraform.read_outputs()
+        if not all(key in outputs for key in lab.outputs):
+            result["message"] = "Terraform outputs are incomplete or missing required keys."
+        else:
+            if not all(key in tfvars for key in lab.variables):
+                result["message"] = "Terraform input variables are incomplete or missing required keys."
+            else:
+                result = make_result(SETUP_TESTID, True, "Terraform setup completed successfully.")
+                # The pipelined context keeps what its early checks fetched
+                context = early_context or Context(lab, outputs, tfvars, deadline)
+                context.outputs = outputs
+                context.state = state
+                context.checkpoint = ckpt
+                context.early_results = (ckpt.stage("apply") or {}).get("early_results", {})
+
+    except config.ConfigError as e:
+        result["message"] = f"Terraform variables are invalid: {e}"
+    except subprocess.CalledProcessError as e:
+        result["message"] = f"Terraform command failed: {e}"
+    except Exception as e:
+        result["message"] = f"An error occurred during Terraform setup: {e}"
+
+    if lab.report_setup:
+        data.append(result)
+    elif context is None:
+        print(result["message"])
+    return context, tfvars
+
+
+def prefetch(lab_checks, ctx):
+    """Fetch every resource the checks declare, one batched call per type."""
+    wanted = {}
+    for check in lab_checks:
+        resource_id = check.resource_id(ctx)
+        if resource_id is None:
+            continue
+        for resource_type in (check.resource,) + check.related:
+            wanted.setdefault(resource_type, []).append(resource_id)
+    for resource_type, ids in wanted.items():
+        ctx.prefetch(resource_type, ids)
+
+
+def snapshot(lab_checks, ctx, data):
+    """Fetch every declared resource, wait for it to settle, then freeze the view.
+
+    Resources in a transitional state are re-fetched every
+    SNAPSHOT_POLL_SECONDS until they settle or the "snapshot" stage budget
+    runs out; the checks then judge whatever was captured last.  A resumed
+    run reuses the snapshot its checkpoint saved.
+    """
+    if ctx.checkpoint.restore_snapshot(ctx):
+        data.snapshot(ctx.snapshot_at, 0.0, ctx.fetched_at)
+        return
+
+    started = time.monotonic()
+    settle_by = started + ctx.deadline.timeout("snapshot", ctx.stage_budgets.get("snapshot", SNAPSHOT_BUDGET))
+    prefetch(lab_checks, ctx)
+    unsettled = ctx.unsettled()
+    while unsettled and time.monotonic() + SNAPSHOT_POLL_SECONDS < settle_by:
+        time.sleep(SNAPSHOT_POLL_SECONDS)
+        for resource_type in {key[0] for key in unsettled}:
+            ctx.invalidate(resource_type)
+        prefetch(lab_checks, ctx)
+        unsettled = ctx.unsettled()
+
+    ctx.freeze()
+    waited = time.monotonic() - started
+    metrics.observe("grader_stage_duration_seconds", waited, {"stage": "snapshot"})
+    if unsettled:
+        print(f"Still changing after {waited:.0f}s, judged as captured: {', '.join(f'{t} {i}' for t, i in unsettled)}")
+    data.snapshot(ctx.snapshot_at, waited, ctx.fetched_at, unsettled)
+    ctx.checkpoint.save_snapshot(ctx)
+
+
+def evaluate(check, ctx):
+    try:
+        resource = ctx.get(check.resource, check.resource_id(ctx)) if check.resource else None
+        passed, message = check.predicate(resource, ctx)
+    except timeouts.StageTimeout as e:
+        # A stage inside one check (kubectl, an HTTP probe) fails that check;
+        # only a spent lab budget cancels the run
+        if ctx.deadline.remaining() <= 0:
+            raise
+        passed, message = False, check.error.format(e.reason)
+    except Exception as e:
+        passed, message = False, check.error.format(e)
+    return make_result(check.testid, passed, message, check.marks)
+
+
+def early_result(index, ctx):
+    """The early pass of the check at ``index``, if it judged what the snapshot froze."""
+    early = ctx.early_results.get(str(index))
+    if early is None:
+        return None
+    passed, message, seconds, judged = early
+    if any(ctx.fetched_at.get((resource_type, resource_id)) != fetched_at for resource_type, resource_id, fetched_at in judged):
+        # The snapshot re-fetched a resource the early check read
+        return None
+    return passed, message, seconds
+
+
+def run_checks(lab_checks, ctx, data):
+    passed = {}
+    snapshot(lab_checks, ctx, data)
+    for index, check in enumerate(lab_checks):
+        seq = len(data) + 1
+        failed = next((testid for testid in check.requires if not passed.get(testid)), None)
+        # Results are saved by position, since a testid may repeat
+        saved = ctx.checkpoint.check_result(index)
+        early = early_result(index, ctx) if saved is None else None
+        if saved is not None:
+            result = saved
+        elif failed is not None:
+            result = skip_result(check, f"{checks.label(failed)} verification failed.", failed)
+        elif early is not None:
+            passed_early, message, seconds = early
+            result = make_result(check.testid, passed_early, message, check.marks)
+            # Early checks ran side by side, so their AWS calls are not attributed
+            ctx.check_stats[seq] = (seconds, None)
+        else:
+            calls, _ = ctx.aws_calls()
+            started = time.monotonic()
+            result = evaluate(check, ctx)
+            ctx.check_stats[seq] = (time.monotonic() - started, ctx.aws_calls()[0] - calls)
+        passed[check.testid] = result["status"] == "success"
+        metrics.inc("grader_check_results_total", {"testid": check.testid, "status": result["status"]})
+        data.append(result)
+        if saved is None:
+            ctx.checkpoint.record_check(index, result)
+
+
+def sweep(lab):
+    """Sweep orphans from earlier runs with the lab's credentials (``grader.sh --sweep``).
+
+    ``evaluate.sh`` runs this in the workspace after its ``terraform destroy``,
+    so the sweep does not hold up the teardown of the run it follows.  After a
+    cancelled or interrupted run it does nothing; the janitor, from cron or by
+    hand, covers those.
+    """
+    if not lab.sweep_orphans or checkpoint.status(".") not in (None, "complete"):
+        return
+    session_kwargs = lab.aws(config.load().variables)
+    if not (session_kwargs.get("aws_access_key_id") and session_kwargs.get("region_name")):
+        return
+    import boto3
+
+    metrics.start(lab.name, tags.run_id(), in_flight=False)
+    sweep_orphaned_resources(boto3.Session(**session_kwargs))
+    metrics.finish()
+
+
+def sweep_orphaned_resources(session):
+    # Delete expired resources from earlier runs that never reached teardown
+    try:
+        metrics.instrument(session.events)
+        summary = janitor.sweep(session, max_wait=0, budget=SWEEP_BUDGET, client_config=timeouts.aws_config())
+        metrics.set_gauge("grader_teardown_backlog", len(summary["found"]) - len(summary["deleted"]))
+        for arn, error in summary["failed"]:
+            print(f"Could not delete orphaned resource {arn}: {error}")
+    except Exception as e:
+        print(f"Orphaned resource sweep failed: {e}")
+
+
+def record_history(path, lab, data, ctx, status, submission, started, setup_duration):
+    aws_calls, aws_cache_hits = ctx.aws_calls() if ctx else (0, 0)
+    run = {
+        "run_id": tags.run_id(),
+        "lab": lab.name,
+        "student": os.environ.get("GRADER_STUDENT_ID"),
+        "submission_hash": submission,
+        "started_at": started,
+        "duration": time.time() - started,
+        "setup_duration": setup_duration,
+        "status": status,
+        "aws_calls": aws_calls,
+        "aws_cache_hits": aws_cache_hits,
+    }
+    check_stats = dict(ctx.check_stats) if ctx else {}
+    if lab.report_setup:
+        # The setup result is always the first one
+        check_stats[1] = (setup_duration, None)
+    try:
+        history.record(path, run, data, check_stats)
+    except Exception as e:
+        print(f"Could not record grading history: {e}")
+
+
+def speculate(lab):
+    """Run the setup stages in a watcher's workspace before grading is requested.
+
+    Pre-flight, init, ``terraform validate``, destroy (only if the workspace
+    has state) and a saved plan, and with GRADER_WATCH_APPLY=1 the apply of
+    that plan.  Every stage is
+    checkpointed for the grading run to skip.  Returns without doing
+    anything if the workspace is already being graded; SIGTERM (from the
+    watcher, when the files change) stops the running stage.
+    """
+    ckpt = checkpoint.load(lab.name, history.submission_hash(exclude=(tags.OVERRIDE_FILE,)), wait=False)
+    if ckpt is None or not lab.apply:
+        return
+    deadline = timeouts.Deadline(lab.budget)
+    deadline.install_signal_handlers()
+    try:
+        config.load().validate()
+        if not ckpt.done("apply"):
+            tags.write_override(lab.name)
+        if not ckpt.done("init"):
+            timeouts.run(["terraform", "init"], deadline, "terraform init", lab.stage_budgets.get("init"), check=True)
+            ckpt.mark("init")
+        timeouts.run(["terraform", "validate"], deadline, "terraform validate", lab.stage_budgets.get("init"), check=True)
+        if not ckpt.done("destroy"):
+            # A fresh workspace has no state, so there is nothing to destroy;
+            # the mark still lets the grading run skip its destroy
+            if os.path.exists(terraform.STATE_FILE):
+                timeouts.run(["terraform", "destroy", "-auto-approve"], deadline, "terraform destroy", lab.stage_budgets.get("destroy"), check=True)
+            ckpt.mark("destroy")
+        if not ckpt.done("plan") and not ckpt.done("apply"):
+            timeouts.run(["terraform", "plan", "-input=false", f"-out={SPECULATIVE_PLAN}"], deadline, "terraform plan", lab.stage_budgets.get("plan"), check=True)
+            ckpt.mark("plan", {"file": SPECULATIVE_PLAN})
+        if os.environ.get("GRADER_WATCH_APPLY") == "1" and not ckpt.done("apply"):
+            try:
+                timeouts.run(["terraform", "apply", "-auto-approve", SPECULATIVE_PLAN], deadline, "terraform apply", lab.stage_budgets.get("apply"), check=True)
+            except BaseException:
+                # The state moved on, so the plan is stale; the grading run
+                # continues the apply without it
+                ckpt.forget("plan")
+                raise
+            ckpt.mark("apply", {"early_results": {}})
+        print(f"Speculative setup done: {', '.join(ckpt.data['stages'])}.")
+    except config.ConfigError as e:
+        print(f"Not speculating, the variables are invalid: {e}")
+    except subprocess.CalledProcessError as e:
+        print(f"Speculative setup stopped: {e}")
+    except timeouts.GradingCancelled as e:
+        print(f"Speculative setup cancelled: {e.reason}")
+    deadline.disarm()
+
+
+def main(lab):
+    if os.environ.get("GRADER_SPECULATE") == "1":
+        speculate(lab)
+    elif os.environ.get("GRADER_SWEEP") == "1":
+        sweep(lab)
+    elif os.environ.get("GRADER_WATCH") == "1":
+        watch.watch(lab, os.environ.get("LAB_DIRECTORY", "/home/labDirectory"))
+    elif os.environ.get("GRADER_PROFILE") == "1":
+        profiling.profile(grade, lab, output_prefix=os.path.splitext(lab.evaluate_path)[0])
+    else:
+        grade(lab)
+
+
+def grade(lab):
+    submission = history.submission_hash(exclude=(tags.OVERRIDE_FILE,))
+    # A lab that reads the student's state must not resume after a re-apply,
+    # or it would reuse a snapshot and results of the old resources
+    ckpt = checkpoint.load(lab.name, submission if lab.apply else history.submission_hash(exclude=(tags.OVERRIDE_FILE,), extra=(terraform.STATE_FILE,)))
+    if ckpt.resumed:
+        tags.resume(ckpt.data["run_id"])
+        print(f"Resuming run {tags.run_id()} from its checkpoint (done: {', '.join(ckpt.data['stages']) or 'nothing'}).")
+
+    data = results.ResultStream(lab.evaluate_path, lab=lab.name, checks=lab.testids())
+    status = "complete"
+    ctx = None
+    setup_duration = None
+    started = time.time()
+    history_path = os.environ.get("GRADER_HISTORY_DB")
+    metrics.start(lab.name, tags.run_id())
+    deadline = timeouts.Deadline(lab.budget)
+    deadline.install_signal_handlers()
+
+    try:
+        ctx, _ = setup(lab, data, deadline, ckpt)
+        setup_duration = time.time() - started
+        metrics.observe("grader_stage_duration_seconds", setup_duration, {"stage": "setup"})
+        if ctx is None:
+            for check in lab.checks:
+                data.append(skip_result(check, "Terraform setup failed."))
+        else:
+            run_checks(lab.checks, ctx, data)
+            metrics.observe("grader_stage_duration_seconds", time.time() - started - setup_duration, {"stage": "checks"})
+
+    except timeouts.GradingCancelled as e:
+        # Teardown is left to the terraform destroy in evaluate.sh, and to the
+        # janitor if that does not run either.  An interrupted run (SIGTERM,
+        # say a container restart) is not finished: evaluate.sh keeps its
+        # workspace and the next run of the same files resumes it
+        timeouts.mark_not_run(data, lab.marks(), e.reason)
+        status = "interrupted" if isinstance(e, timeouts.Interrupted) else "cancelled"
+    deadline.disarm()
+
+    # Results were saved as they were appended; mark the run finished
+    data.close(status)
+    ckpt.finish(status)
+    metrics.observe("grader_grade_duration_seconds", time.time() - started)
+    metrics.inc("grader_grades_total", {"status": status})
+
+    if history_path:
+        record_history(history_path, lab, data, ctx, status, submission, started, setup_duration)
+
+    metrics.finish()
@@ -0,0 +1,39 @@
+"""kubectl access to EKS clusters without ``aws eks update-kubeconfig``.
+
+``update-kubeconfig`` describes the cluster again through the aws CLI and
+rewrites ``~/.kube/config``.  The grader already has the cluster description,
+so it writes a run-local kubeconfig from it instead.  kubectl accepts JSON
+kubeconfigs, and tokens are still obtained through ``aws eks get-token``.
+"""
+import json
+
+
+def write_kubeconfig(cluster, region, path):
+    """Write a kubeconfig for a ``describe_cluster`` result and return its path."""
+    name = cluster["arn"]
+    config = {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "clusters": [{
+            "name": name,
+            "cluster": {
+                "server": cluster["endpoint"],
+                "certificate-authority-data": cluster["certificateAuthority"]["data"],
+            },
+        }],
+        "users": [{
+            "name": name,
+            "user": {
+                "exec": {
+                    "apiVersion": "client.authentication.k8s.io/v1beta1",
+                    "command": "aws",
+                    "args": ["--region", region, "eks", "get-token", "--cluster-name", cluster["name"], "--output", "json"],
+                },
+            },
+        }],
+        "contexts": [{"name": name, "context": {"cluster": name, "user": name}}],
+        "current-context": name,
+    }
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+    return path
@@ -0,0 +1,314 @@
+"""Prometheus metrics for the grading pipeline.
+
+When ``GRADER_METRICS_DIR`` is set, every grading run updates
+``grader_<lab>.prom`` in that directory in the text exposition format, ready
+for node_exporter's textfile collector.  A grader is a short-lived process,
+so counters and histograms are accumulated in ``grader_<lab>.state.json``
+next to it; each run merges its own observations under a file lock and
+rewrites the ``.prom`` file atomically.  Grades in flight are tracked by
+process ID, so a grader that was killed stops counting once its process is
+gone.
+
+Without a textfile collector, serve the directory over HTTP::
+
+    python3 -m grading.metrics serve --dir DIR [--port 9464]
+
+Metrics (all labelled with ``lab``):
+
+* ``grader_grades_in_flight``
+* ``grader_grades_total{status}``
+* ``grader_grade_duration_seconds`` and ``grader_stage_duration_seconds{stage}``
+  (histograms)
+* ``grader_check_results_total{testid,status}``
+* ``grader_terraform_failures_total{command}``
+* ``grader_drift_checks_total{result}``: post-apply drift checks that were
+  ``in_sync``, found ``drift`` or hit an ``error``
+* ``grader_aws_api_errors_total{service,code}`` and
+  ``grader_aws_api_throttles_total{service}``
+* ``grader_teardown_backlog``: orphaned resources the last sweep left behind
+"""
+import argparse
+import fcntl
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 900, 1800)
+
+THROTTLE_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "SlowDown",
+}
+
+HELP = {
+    "grader_grades_in_flight": ("gauge", "Grading runs currently in progress."),
+    "grader_grades_total": ("counter", "Finished grading runs by status."),
+    "grader_grade_duration_seconds": ("histogram", "Wall time of a whole grading run."),
+    "grader_stage_duration_seconds": ("histogram", "Wall time of a grading stage (terraform, kubectl, checks)."),
+    "grader_check_results_total": ("counter", "Check results by testid and status."),
+    "grader_terraform_failures_total": ("counter", "Terraform commands that failed or timed out."),
+    "grader_drift_checks_total": ("counter", "Post-apply refresh-only plans by result (in_sync, drift, error)."),
+    "grader_aws_api_errors_total": ("counter", "AWS API calls that returned an error after retries."),
+    "grader_aws_api_throttles_total": ("counter", "Throttled AWS API attempts, including retried ones."),
+    "grader_teardown_backlog": ("gauge", "Orphaned resources found but not deleted by the last sweep."),
+}
+
+
+def _key(labels):
+    return json.dumps(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """Observations of one run, merged into the lab's state file on flush."""
+
+    def __init__(self, directory, lab, run_id):
+        self.directory = directory
+        self.lab = lab
+        self.run_id = run_id
+        self.prom_path = os.path.join(directory, f"grader_{lab}.prom")
+        self.state_path = os.path.join(directory, f"grader_{lab}.state.json")
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def _labels(self, labels):
+        return _key(dict(labels or {}, lab=self.lab))
+
+    def inc(self, name, labels=None, value=1):
+        key = self._labels(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = self._labels(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.setdefault(key, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def set_gauge(self, name, value, labels=None):
+        with self._lock:
+            self.gauges.setdefault(name, {})[self._labels(labels)] = value
+
+    def flush(self, in_flight):
+        """Merge this run's observations into the state file and re-render."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(self.state_path + ".lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.state_path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+            for section in ("counters", "histograms", "gauges", "in_flight"):
+                state.setdefault(section, {})
+
+            for name, series in self.counters.items():
+                merged = state["counters"].setdefault(name, {})
+                for key, value in series.items():
+                    merged[key] = merged.get(key, 0) + value
+            for name, series in self.histograms.items():
+                merged = state["histograms"].setdefault(name, {})
+                for key, histogram in series.items():
+                    target = merged.setdefault(key, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0})
+                    target["buckets"] = [a + b for a, b in zip(target["buckets"], histogram["buckets"])]
+                    target["sum"] += histogram["sum"]
+                    target["count"] += histogram["count"]
+            for name, series in self.gauges.items():
+                state["gauges"].setdefault(name, {}).update(series)
+
+            if in_flight:
+                state["in_flight"][self.run_id] = os.getpid()
+            else:
+                state["in_flight"].pop(self.run_id, None)
+            state["in_flight"] = {run_id: pid for run_id, pid in state["in_flight"].items() if _pid_alive(pid)}
+
+            self._write(self.state_path, json.dumps(state))
+            self._write(self.prom_path, self.render(state))
+            self._reset()
+
+    def render(self, state):
+        lines = []
+
+        def header(name):
+            kind, text = HELP[name]
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        header("grader_grades_in_flight")
+        lines.append(f"grader_grades_in_flight{_format_labels([('lab', self.lab)])} {len(state['in_flight'])}")
+        for section in ("counters", "gauges"):
+            for name, series in sorted(state[section].items()):
+                header(name)
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(json.loads(key))} {value}")
+        for name, series in sorted(state["histograms"].items()):
+            header(name)
+            for key, histogram in sorted(series.items()):
+                pairs = json.loads(key)
+                for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                    lines.append(f"{name}_bucket{_format_labels(pairs + [['le', bound]])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(pairs + [['le', '+Inf']])} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(pairs)} {histogram['sum']}")
+                lines.append(f"{name}_count{_format_labels(pairs)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _write(path, content):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+# The run's registry; None (and every helper a no-op) when metrics are off
+_registry = None
+
+
+def start(lab, run_id, in_flight=True):
+    """Enable metrics for this run if GRADER_METRICS_DIR is set.
+
+    ``in_flight=False`` is for a process that is not a grade (the sweep).
+    """
+    global _registry
+    directory = os.environ.get("GRADER_METRICS_DIR")
+    if not directory:
+        return
+    _registry = Registry(directory, lab, run_id)
+    _flush(in_flight=in_flight)
+
+
+def finish():
+    _flush(in_flight=False)
+
+
+def _flush(in_flight):
+    if _registry is None:
+        return
+    try:
+        _registry.flush(in_flight)
+    except Exception as e:
+        print(f"Could not write metrics: {e}")
+
+
+def inc(name, labels=None, value=1):
+    if _registry is not None:
+        _registry.inc(name, labels, value)
+
+
+def observe(name, value, labels=None):
+    if _registry is not None:
+        _registry.observe(name, value, labels)
+
+
+def set_gauge(name, value, labels=None):
+    if _registry is not None:
+        _registry.set_gauge(name, value, labels)
+
+
+def _error_code(parsed):
+    return ((parsed or {}).get("Error") or {}).get("Code")
+
+
+def _on_needs_retry(event_name, response=None, **kwargs):
+    # Fired once per attempt, so throttles that were retried still count
+    if response is not None and _error_code(response[1]) in THROTTLE_CODES:
+        inc("grader_aws_api_throttles_total", {"service": event_name.split(".")[1]})
+
+
+def _on_after_call(event_name, parsed=None, **kwargs):
+    code = _error_code(parsed)
+    if code:
+        inc("grader_aws_api_errors_total", {"service": event_name.split(".")[1], "code": code})
+
+
+def instrument(events):
+    """Count AWS errors and throttles through a client's or session's event hooks."""
+    if _registry is None:
+        return
+    events.register("needs-retry", _on_needs_retry)
+    events.register("after-call", _on_after_call)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    directory = "."
+
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = b""
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".prom"):
+                with open(os.path.join(self.directory, name), 'rb') as f:
+                    body += f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve grader metrics over HTTP.")
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("--dir", default=os.environ.get("GRADER_METRICS_DIR"), help="metrics directory (default: $GRADER_METRICS_DIR)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9464)
+    args = parser.parse_args(argv)
+
+    if not args.dir:
+        print("No metrics directory; pass --dir or set GRADER_METRICS_DIR.")
+        return 1
+    _Handler.directory = args.dir
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    print(f"Serving {args.dir} on http://{args.host}:{args.port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Stream check results to disk as they complete.
+
+:class:`ResultStream` is a drop-in replacement for the ``data`` list the
+checks append to.  Every ``append()`` writes one NDJSON record to
+``evaluate.ndjson`` and atomically rewrites ``evaluate.json`` (temporary file
+plus ``os.replace``), so students and the LMS see results while slow stages
+are still running, and a crash keeps everything recorded so far.
+
+Records in ``evaluate.ndjson``::
+
+    {"type": "start", "run_id": ..., "lab": ..., "checks": [...], "time": ...}
+    {"type": "snapshot", "time": ..., "waited": ..., "resources": [...], "unsettled": [...]}
+    {"type": "result", "seq": 1, "time": ..., "result": {...}}
+    {"type": "end", "run_id": ..., "status": "complete", "time": ...}
+
+Pollers can read the file incrementally from their last offset instead of
+re-parsing ``evaluate.json``.  The ``snapshot`` record lists every resource
+the checks were evaluated against with the time it was fetched.
+"""
+import datetime
+import json
+import os
+import threading
+
+from . import tags
+
+
+def _timestamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds")
+
+
+class ResultStream(list):
+    def __init__(self, path, lab=None, checks=None):
+        super().__init__()
+        self.path = path
+        self.log_path = os.path.splitext(path)[0] + ".ndjson"
+        self._lock = threading.Lock()
+
+        # Each run starts a fresh log; within the run it is append-only
+        with open(self.log_path, 'w') as f:
+            f.write(json.dumps({"type": "start", "run_id": tags.run_id(), "lab": lab, "checks": checks or [], "time": _now()}) + "\n")
+        self._rollup()
+
+    def append(self, result):
+        with self._lock:
+            super().append(result)
+            self._log({"type": "result", "seq": len(self), "time": _now(), "result": result})
+            self._rollup()
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def snapshot(self, taken_at, waited, fetched_at, unsettled=()):
+        """Log the frozen view: when each resource was fetched, and which had not settled."""
+        with self._lock:
+            self._log({
+                "type": "snapshot",
+                "time": _timestamp(taken_at),
+                "waited": round(waited, 3),
+                "resources": [{"type": key[0], "id": key[1], "fetched_at": _timestamp(seconds)} for key, seconds in sorted(fetched_at.items(), key=lambda item: item[1])],
+                "unsettled": [{"type": key[0], "id": key[1]} for key in unsettled],
+            })
+
+    def close(self, status="complete"):
+        with self._lock:
+            self._log({"type": "end", "run_id": tags.run_id(), "status": status, "time": _now()})
+            self._rollup()
+
+    def _log(self, record):
+        with open(self.log_path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rollup(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"data": list(self)}, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
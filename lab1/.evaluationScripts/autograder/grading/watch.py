@@ -0,0 +1,146 @@
+"""Speculative setup while the student is still editing (``grader.sh --watch``).
+
+The watcher polls the lab directory's submission hash.  Once the files have
+not changed for ``GRADER_WATCH_QUIET`` seconds and the variables pass the
+pre-flight check, it copies them into the workspace ``evaluate.sh`` will use
+for that hash and starts ``autograder.py`` there with
+``GRADER_SPECULATE=1`` (see ``engine.speculate``).  That runs init,
+``terraform validate``, a destroy if the workspace already has state, and a
+saved plan, plus the apply with ``GRADER_WATCH_APPLY=1``, checkpointing
+each stage.  When the student later
+runs ``evaluate.sh`` on the same files, the grading run resumes from those
+checkpoints.
+
+When the files change, the running speculation is stopped with SIGTERM and
+its workspace is deleted, after a ``terraform destroy`` if it may have
+applied anything.  A workspace that a grading run holds (see
+``checkpoint.lock``) is left to that run.
+"""
+import glob
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+from . import checkpoint, config, history, tags, timeouts
+
+POLL_SECONDS = 2
+QUIET_SECONDS = int(os.environ.get("GRADER_WATCH_QUIET", 30))
+
+# A speculation stops its terraform command gracefully before it exits
+CANCEL_GRACE_SECONDS = 3 * timeouts.KILL_GRACE_SECONDS
+
+
+class Speculation:
+    def __init__(self, submission, workspace, proc):
+        self.submission = submission
+        self.workspace = workspace
+        self.proc = proc
+
+
+def workspace_path(submission, root=checkpoint.WORKSPACE_ROOT):
+    return os.path.join(root, submission[:16])
+
+
+def preflight(lab_directory):
+    """Whether the submission is worth speculating on: .tf files and valid variables."""
+    if not config._files(lab_directory)[0]:
+        return False
+    try:
+        config.load(lab_directory).validate()
+    except config.ConfigError:
+        return False
+    return True
+
+
+def prepare(lab_directory, submission, root=checkpoint.WORKSPACE_ROOT):
+    """Copy the submission into its workspace; returns None if it changed meanwhile.
+
+    Copies rather than links, so later edits cannot reach a speculation that
+    is still running.
+    """
+    workspace = workspace_path(submission, root)
+    os.makedirs(workspace, exist_ok=True)
+    for pattern in history.SUBMISSION_PATTERNS:
+        for path in glob.glob(os.path.join(lab_directory, pattern)):
+            target = os.path.join(workspace, os.path.basename(path))
+            if os.path.islink(target):
+                # evaluate.sh already linked the files; it owns this workspace
+                return None
+            shutil.copyfile(path, target)
+    if history.submission_hash(workspace, exclude=(tags.OVERRIDE_FILE,)) != submission:
+        shutil.rmtree(workspace, ignore_errors=True)
+        return None
+    return workspace
+
+
+def start(workspace):
+    env = dict(os.environ, GRADER_SPECULATE="1")
+    env.pop("GRADER_WATCH", None)
+    script = os.path.abspath(sys.argv[0])
+    return subprocess.Popen([sys.executable, script], cwd=workspace, env=env, start_new_session=True)
+
+
+def discard(lab, speculation):
+    """Stop a speculation and delete its workspace, unless a grading run took it over."""
+    timeouts.kill_process_group(speculation.proc, grace=CANCEL_GRACE_SECONDS)
+    workspace = speculation.workspace
+    if not os.path.isdir(workspace):
+        return
+    handle = checkpoint.lock(os.path.join(workspace, checkpoint.CHECKPOINT_FILE + checkpoint.LOCK_SUFFIX), wait=False)
+    if handle is None:
+        return
+    try:
+        if os.environ.get("GRADER_WATCH_APPLY") == "1" and not checkpoint.finished(workspace):
+            print(f"Destroying what the speculation on {speculation.submission[:16]} applied.")
+            try:
+                timeouts.run(["terraform", "destroy", "-auto-approve"], timeouts.Deadline(lab.budget), "terraform destroy", lab.stage_budgets.get("destroy"), check=True, cwd=workspace)
+            except subprocess.CalledProcessError as e:
+                # Its resources are tagged, so the janitor deletes them later
+                print(f"terraform destroy failed: {e}")
+        shutil.rmtree(workspace, ignore_errors=True)
+    finally:
+        handle.close()
+
+
+def watch(lab, lab_directory, root=checkpoint.WORKSPACE_ROOT, quiet=QUIET_SECONDS):
+    """Speculate on every submission that stays unchanged for ``quiet`` seconds."""
+    if not lab.apply:
+        print(f"Nothing to speculate on: {lab.name} reads the state the student applied.")
+        return
+
+    def on_term(signum, frame):
+        raise timeouts.GradingCancelled("watcher was terminated")
+
+    signal.signal(signal.SIGTERM, on_term)
+    print(f"Watching {lab_directory}; speculating after {quiet}s without changes.")
+    seen, changed_at = None, time.monotonic()
+    # The submission last speculated on (or found being graded), and its speculation
+    handled, current = None, None
+    try:
+        while True:
+            try:
+                submission = history.submission_hash(lab_directory)
+            except OSError:
+                # A file was replaced while it was read (an editor saving it)
+                time.sleep(POLL_SECONDS)
+                continue
+            if submission != seen:
+                seen, changed_at = submission, time.monotonic()
+                if current is not None and current.submission != submission:
+                    print(f"Submission changed; discarding the speculation on {current.submission[:16]}.")
+                    discard(lab, current)
+                    current = None
+            elif submission != handled and time.monotonic() - changed_at >= quiet and preflight(lab_directory):
+                handled = submission
+                workspace = prepare(lab_directory, submission, root)
+                if workspace is not None:
+                    print(f"Speculating on {submission[:16]}.")
+                    current = Speculation(submission, workspace, start(workspace))
+            time.sleep(POLL_SECONDS)
+    except (KeyboardInterrupt, timeouts.GradingCancelled):
+        # Checkpointed stages stay for the grading run to resume
+        if current is not None:
+            timeouts.kill_process_group(current.proc, grace=CANCEL_GRACE_SECONDS)
@@ -5,45 +5,62 @@ INSTRUCTOR_SCRIPTS="/home/.evaluationScripts"
 # INSTRUCTOR_SCRIPTS="."
 LAB_DIRECTORY="../labDirectory"
 
+# Grading budget in seconds; the grader stops itself when it runs out and the
+# outer timeout is only a backstop in case it hangs
+export GRADER_BUDGET="${GRADER_BUDGET:-1800}"
+
 
 ptcd=$(pwd)
 
 cd $INSTRUCTOR_SCRIPTS
 # echo $ptcd
 
-list_of_files="$(ls $LAB_DIRECTORY)"
-
-
-cp -r $LAB_DIRECTORY/* autograder/
-
-cd ./autograder/
-
-chmod -R 777 $list_of_files
-
-./grader.sh
-
-# Run terraform destroy to clean up resources
-terraform destroy -auto-approve
-
-rm -r $list_of_files
-
-if [ -d .terraform ]; then
-    rm -rf .terraform
+# Terraform only needs the configuration, the variables and the user-data
+# scripts. Link those into a workspace instead of copying the whole lab
+# directory (lab document included) next to the grader. The workspace is
+# keyed by the submission's hash, so a run that was interrupted resumes from
+# its checkpoint and state the next time the same files are graded
+export GRADER_WORKSPACE_ROOT="${GRADER_WORKSPACE_ROOT:-${TMPDIR:-/tmp}/grader-workspaces}"
+# Workspaces of runs that were never resumed. Destroy what an unfinished run
+# provisioned before removing its workspace; if that fails, keep the state and
+# retry once the workspace is stale again
+if [ -d "$GRADER_WORKSPACE_ROOT" ]; then
+    find "$GRADER_WORKSPACE_ROOT" -mindepth 1 -maxdepth 1 -type d -mmin +$(( ${GRADER_RESOURCE_TTL:-7200} / 60 )) -print | while read -r stale; do
+        if [ -f "$stale/terraform.tfstate" ] && ! (cd autograder && python3 -m grading.checkpoint finished "$stale"); then
+            if ! (cd "$stale" && timeout --signal=TERM --kill-after=60 900 terraform destroy -auto-approve < /dev/null); then
+                touch "$stale"
+                continue
+            fi
+        fi
+        rm -rf "$stale"
+    done
 fi
+LAB_PATH="$(realpath "$LAB_DIRECTORY")"
+WORKSPACE="$(cd autograder && python3 -m grading.checkpoint workspace "$LAB_PATH")"
+for file in "$LAB_DIRECTORY"/*.tf "$LAB_DIRECTORY"/*.tfvars "$LAB_DIRECTORY"/*.sh; do
+    if [ -f "$file" ]; then
+        ln -sf "$(realpath "$file")" "$WORKSPACE/"
+    fi
+done
 
+export GRADER_EVALUATE_PATH="$(pwd)/evaluate.json"
+export GRADER_HISTORY_DB="${GRADER_HISTORY_DB-$(pwd)/grading_history.sqlite3}"
 
-# Check and remove Terraform-related files
-if [ -f terraform.tfstate ]; then
-    rm terraform.tfstate
-fi
+cd "$WORKSPACE"
 
-if [ -f terraform.tfstate.backup ]; then
-    rm terraform.tfstate.backup
-fi
+timeout --signal=TERM --kill-after=60 $((GRADER_BUDGET + 120)) "$INSTRUCTOR_SCRIPTS/autograder/grader.sh"
 
-if [ -f .terraform.lock.hcl ]; then
-    rm .terraform.lock.hcl
-fi
+# A run that did not finish (the grader crashed or was killed) keeps its
+# workspace and resources for the next run to resume
+if (cd "$INSTRUCTOR_SCRIPTS/autograder" && python3 -m grading.checkpoint finished "$WORKSPACE"); then
+    # Run terraform destroy to clean up resources
+    timeout --signal=TERM --kill-after=60 900 terraform destroy -auto-approve
 
+    # Then sweep what earlier runs leaked, now that it delays nothing of this one
+    timeout --signal=TERM --kill-after=10 120 "$INSTRUCTOR_SCRIPTS/autograder/grader.sh" --sweep
 
-cd "$ptcd"
\ No newline at end of file
+    # State, provider plugins and the grader override all live in the workspace
+    cd "$ptcd"
+    rm -rf "$WORKSPACE"
+fi
+cd "$ptcd"
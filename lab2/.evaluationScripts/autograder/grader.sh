@@ -1,3 +1,20 @@
 #! /bin/bash
 
-python3 autograder.py
+# grader.sh --profile writes evaluate.prof and evaluate.profile.txt next to evaluate.json
+if [ "$1" = "--profile" ]; then
+    export GRADER_PROFILE=1
+fi
+
+# grader.sh --watch speculatively runs the setup while the student edits
+# $LAB_DIRECTORY, for evaluate.sh to resume (see "Speculative setup" in the README)
+if [ "$1" = "--watch" ]; then
+    export GRADER_WATCH=1
+fi
+
+# grader.sh --sweep deletes expired resources of earlier runs; evaluate.sh runs
+# it after its terraform destroy
+if [ "$1" = "--sweep" ]; then
+    export GRADER_SWEEP=1
+fi
+
+exec python3 "$(dirname "$0")/autograder.py"
@@ -0,0 +1,203 @@
+"""Checkpoints that let a grading run resume after a crash or a restart.
+
+The engine records every stage it completes in ``checkpoint.json`` in the
+working directory: ``init``, ``destroy`` and ``apply`` for the labs that
+provision, then the frozen resource snapshot and each check result.  A run
+that starts next to an unfinished checkpoint for the same lab and submission
+continues from there, against the Terraform state the earlier run left
+behind, under the earlier run ID.  For a lab that grades the state the
+student applied, the state is part of the submission, so re-applying
+starts a new run.  Finished runs (``complete``, or ``cancelled`` when the
+budget ran out), checkpoints for other files and checkpoints older than
+``GRADER_RESOURCE_TTL`` (after which the janitor may have deleted the
+resources) start over.  A run stopped by SIGTERM ends ``interrupted`` and
+is resumed like one that crashed.  ``GRADER_CHECKPOINT=0`` turns checkpoints off.
+
+A process holds ``checkpoint.json.lock`` for as long as it uses the
+checkpoint, so a grading run waits for a speculative run (``grading.watch``)
+in the same workspace to finish before it continues from there.
+
+``evaluate.sh`` keeps the workspace, and so the state and the checkpoint, in
+a directory keyed by the submission's hash and only tears it down once the
+run has finished::
+
+    python3 -m grading.checkpoint workspace LAB_DIRECTORY   # print (and create) it
+    python3 -m grading.checkpoint finished WORKSPACE        # exit 0 if finished
+"""
+import argparse
+import fcntl
+import json
+import os
+import sys
+import time
+
+from . import history, tags
+
+CHECKPOINT_FILE = "checkpoint.json"
+LOCK_SUFFIX = ".lock"
+WORKSPACE_ROOT = os.environ.get("GRADER_WORKSPACE_ROOT", os.path.join(os.environ.get("TMPDIR", "/tmp"), "grader-workspaces"))
+FINISHED = ("complete", "cancelled")
+
+
+def _encode_resource(value):
+    if isinstance(value, Exception):
+        return {"__error__": str(value)}
+    return value
+
+
+def _decode_resource(value):
+    if isinstance(value, dict) and set(value) == {"__error__"}:
+        return LookupError(value["__error__"])
+    return value
+
+
+def _decode_id(resource_id):
+    # JSON turns the (cluster, node group) keys into lists
+    return tuple(resource_id) if isinstance(resource_id, list) else resource_id
+
+
+def lock(path, wait=True):
+    """Hold an exclusive lock on path; returns the open lock file, or None if busy and not waiting."""
+    handle = open(path, 'a')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        if not wait:
+            handle.close()
+            return None
+        print("Waiting for the speculative run on this submission to finish.")
+        fcntl.flock(handle, fcntl.LOCK_EX)
+    return handle
+
+
+class Checkpoint:
+    def __init__(self, path, data, resumed=False, lock=None):
+        self.path = path
+        self.data = data
+        self.resumed = resumed
+        # Released when the process exits
+        self.lock = lock
+
+    def done(self, stage):
+        return stage in self.data["stages"]
+
+    def stage(self, stage):
+        """What a completed stage recorded, or None."""
+        return self.data["stages"].get(stage)
+
+    def mark(self, stage, value=True):
+        self.data["stages"][stage] = value
+        self.save()
+
+    def forget(self, stage):
+        if self.data["stages"].pop(stage, None) is not None:
+            self.save()
+
+    def check_result(self, index):
+        return self.data["checks"].get(str(index))
+
+    def record_check(self, index, result):
+        self.data["checks"][str(index)] = result
+        self.save()
+
+    def save_snapshot(self, ctx):
+        self.mark("snapshot", {
+            "taken_at": ctx.snapshot_at,
+            "resources": [[key[0], key[1], _encode_resource(value), ctx.fetched_at.get(key)] for key, value in ctx.resources.items()],
+        })
+
+    def restore_snapshot(self, ctx):
+        """Load the saved snapshot into ctx; returns False if there is none."""
+        snapshot = self.stage("snapshot")
+        if not snapshot:
+            return False
+        for resource_type, resource_id, value, fetched_at in snapshot["resources"]:
+            key = (resource_type, _decode_id(resource_id))
+            ctx.resources[key] = _decode_resource(value)
+            if fetched_at is not None:
+                ctx.fetched_at[key] = fetched_at
+        ctx.snapshot_at = snapshot["taken_at"]
+        return True
+
+    def finish(self, status):
+        self.data["status"] = status
+        self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        self.data["updated_at"] = time.time()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def load(lab, submission, path=CHECKPOINT_FILE, max_age=tags.DEFAULT_TTL, wait=True):
+    """Resume the unfinished checkpoint at path, or start a new one.
+
+    Returns None if another process holds the checkpoint and ``wait`` is
+    false.  With GRADER_CHECKPOINT=0 the checkpoint is kept in memory only.
+    """
+    if os.environ.get("GRADER_CHECKPOINT") == "0":
+        path = None
+    fresh = {"lab": lab, "submission": submission, "run_id": tags.run_id(), "status": "running", "started_at": time.time(), "stages": {}, "checks": {}}
+    if path is None:
+        return Checkpoint(None, fresh)
+    handle = lock(path + LOCK_SUFFIX, wait)
+    if handle is None:
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = None
+    if (
+        data
+        and data.get("status") not in FINISHED
+        and data.get("lab") == lab
+        and data.get("submission") == submission
+        and time.time() - data.get("updated_at", 0) < max_age
+    ):
+        return Checkpoint(path, data, resumed=True, lock=handle)
+    checkpoint = Checkpoint(path, fresh, lock=handle)
+    checkpoint.save()
+    return checkpoint
+
+
+def status(directory):
+    """The status of the run in a workspace, or None if it left no checkpoint."""
+    try:
+        with open(os.path.join(directory, CHECKPOINT_FILE)) as f:
+            return json.load(f).get("status")
+    except (OSError, ValueError):
+        return None
+
+
+def finished(directory):
+    """Whether the run in a workspace finished (or never left a checkpoint)."""
+    run_status = status(directory)
+    return run_status is None or run_status in FINISHED
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Workspaces and checkpoints for resumable grading runs.")
+    parser.add_argument("command", choices=["workspace", "finished"])
+    parser.add_argument("directory", help="lab directory (workspace) or workspace (finished)")
+    parser.add_argument("--root", default=WORKSPACE_ROOT, help=f"where workspaces are kept (default: $GRADER_WORKSPACE_ROOT or {WORKSPACE_ROOT})")
+    parser.add_argument("--extra", action="append", default=[], metavar="PATTERN", help="also hash files matching PATTERN (repeatable)")
+    args = parser.parse_args(argv)
+
+    if args.command == "workspace":
+        # Same submission, same workspace: a restarted run finds its state
+        workspace = os.path.join(args.root, history.submission_hash(args.directory, extra=args.extra)[:16])
+        os.makedirs(workspace, exist_ok=True)
+        print(workspace)
+        return 0
+    return 0 if finished(args.directory) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
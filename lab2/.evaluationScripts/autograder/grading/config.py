@@ -0,0 +1,513 @@
+"""Typed Terraform variables for a grading run.
+
+:func:`load` reads the submission's ``*.tfvars`` and the ``variable`` blocks
+in its ``*.tf`` files and returns a :class:`LabConfig`.  Values are converted
+to the declared types, the same way Terraform converts them, and checked
+before anything is applied.  Variables keep their defaults unless a tfvars
+file sets them.  The parser covers the HCL that variable files use: strings
+(with ``${...}`` templates kept as written), numbers, booleans, null, lists,
+maps, heredocs, and ``#``, ``//`` and ``/* */`` comments.  Other blocks in
+the ``*.tf`` files are skipped; only the AWS provider's literal ``region`` is
+kept.
+
+Configs are memoized by a hash of the files, so the engine, the client
+factories and the checks can all call :func:`load` and share one parse.
+"""
+import glob
+import hashlib
+import os
+import re
+
+from . import tags
+
+TFVARS_PATTERNS = ("terraform.tfvars", "*.auto.tfvars")
+
+
+class ConfigError(Exception):
+    pass
+
+
+class Expression(str):
+    """Source text of an expression that is not a literal, e.g. ``var.region``."""
+
+
+class Variable:
+    def __init__(self, name, type=None, default=None, has_default=False, description=None):
+        self.name = name
+        self.type = type
+        self.default = default
+        self.has_default = has_default
+        self.description = description
+
+
+class LabConfig:
+    def __init__(self, digest, declared, tfvars, provider_region=None, parsed=True):
+        self.digest = digest
+        self.declared = declared
+        self.tfvars = tfvars
+        self.provider_region = provider_region
+        self.variables = {}
+        self.errors = []
+        self.warnings = []
+
+        for name, variable in declared.items():
+            if name in tfvars:
+                value = tfvars[name]
+            elif variable.has_default:
+                value = variable.default
+            else:
+                self.errors.append(f"No value for required variable {name}")
+                continue
+            try:
+                self.variables[name] = convert(value, variable.type)
+            except ConfigError as e:
+                self.errors.append(f"Invalid value for variable {name}: {e}")
+        for name, value in tfvars.items():
+            if name not in declared:
+                if parsed:
+                    self.warnings.append(f"Value for undeclared variable {name}")
+                self.variables[name] = value
+
+    def validate(self):
+        if self.errors:
+            raise ConfigError("; ".join(self.errors))
+
+
+# --- tokenizer ------------------------------------------------------------
+
+_NUMBER = re.compile(r"\d+(\.\d+)?([eE][+-]?\d+)?")
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_-]*")
+_HEREDOC = re.compile(r"<<(-?)([A-Za-z_][A-Za-z0-9_]*)[ \t]*\n")
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\"": "\"", "\\": "\\"}
+
+
+def _skip_template(text, i):
+    """Return the index after the ``}`` closing a ``${`` or ``%{`` at i."""
+    depth = 0
+    while i < len(text):
+        c = text[i]
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        elif c == "\"":
+            i = _read_string(text, i)[1] - 1
+        i += 1
+    raise ConfigError("unterminated template expression")
+
+
+def _read_string(text, i):
+    """Read the quoted string starting at i; return (value, index after it)."""
+    out = []
+    i += 1
+    while i < len(text):
+        c = text[i]
+        if c == "\"":
+            return "".join(out), i + 1
+        if c == "\n":
+            break
+        if c == "\\" and i + 1 < len(text):
+            nxt = text[i + 1]
+            if nxt == "u" and i + 6 <= len(text):
+                out.append(chr(int(text[i + 2:i + 6], 16)))
+                i += 6
+                continue
+            out.append(_ESCAPES.get(nxt, nxt))
+            i += 2
+            continue
+        if c in "$%" and text.startswith("{", i + 1):
+            end = _skip_template(text, i + 1)
+            out.append(text[i:end])
+            i = end
+            continue
+        out.append(c)
+        i += 1
+    raise ConfigError("unterminated string")
+
+
+def tokenize(text):
+    """Split HCL into (kind, value) tokens; kinds are ident, string, number, newline, punct."""
+    tokens = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c in " \t\r":
+            i += 1
+        elif c == "\n":
+            tokens.append(("newline", "\n"))
+            i += 1
+        elif c == "#" or text.startswith("//", i):
+            while i < len(text) and text[i] != "\n":
+                i += 1
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            if end < 0:
+                raise ConfigError("unterminated comment")
+            i = end + 2
+        elif c == "\"":
+            value, i = _read_string(text, i)
+            tokens.append(("string", value))
+        elif c == "<" and _HEREDOC.match(text, i):
+            match = _HEREDOC.match(text, i)
+            indent, marker = match.group(1), match.group(2)
+            lines = []
+            i = match.end()
+            while True:
+                if i >= len(text):
+                    raise ConfigError(f"unterminated heredoc {marker}")
+                end = text.find("\n", i)
+                end = len(text) if end < 0 else end
+                line = text[i:end]
+                i = end + 1
+                if line.strip() == marker:
+                    break
+                lines.append(line)
+            if indent:
+                margin = min((len(l) - len(l.lstrip()) for l in lines if l.strip()), default=0)
+                lines = [l[margin:] for l in lines]
+            tokens.append(("string", "".join(l + "\n" for l in lines)))
+            tokens.append(("newline", "\n"))
+        elif c.isdigit():
+            match = _NUMBER.match(text, i)
+            raw = match.group(0)
+            tokens.append(("number", float(raw) if any(ch in raw for ch in ".eE") else int(raw)))
+            i = match.end()
+        elif _IDENT.match(text, i):
+            match = _IDENT.match(text, i)
+            tokens.append(("ident", match.group(0)))
+            i = match.end()
+        else:
+            tokens.append(("punct", c))
+            i += 1
+    tokens.append(("eof", None))
+    return tokens
+
+
+# --- parser ---------------------------------------------------------------
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def expect(self, kind, value=None):
+        token = self.next()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise ConfigError(f"expected {value or kind}, found {token[1]!r}")
+        return token
+
+    def skip_newlines(self):
+        while self.peek()[0] == "newline":
+            self.pos += 1
+
+    def value(self):
+        """Parse a literal value: string, number, bool, null, list or map."""
+        self.skip_newlines()
+        kind, value = self.next()
+        if kind in ("string", "number"):
+            return value
+        if kind == "ident" and value in ("true", "false"):
+            return value == "true"
+        if kind == "ident" and value == "null":
+            return None
+        if (kind, value) == ("punct", "-") and self.peek()[0] == "number":
+            return -self.next()[1]
+        if (kind, value) == ("punct", "["):
+            items = []
+            while True:
+                self.skip_newlines()
+                if self.peek() == ("punct", "]"):
+                    self.next()
+                    return items
+                items.append(self.value())
+                self.skip_newlines()
+                if self.peek() == ("punct", ","):
+                    self.next()
+        if (kind, value) == ("punct", "{"):
+            items = {}
+            while True:
+                self.skip_newlines()
+                if self.peek() == ("punct", "}"):
+                    self.next()
+                    return items
+                key_kind, key = self.next()
+                if key_kind not in ("ident", "string"):
+                    raise ConfigError(f"invalid map key {key!r}")
+                separator = self.next()
+                if separator not in (("punct", "="), ("punct", ":")):
+                    raise ConfigError(f"expected = after map key {key!r}")
+                items[key] = self.value()
+                if self.peek() == ("punct", ","):
+                    self.next()
+        raise ConfigError(f"unsupported expression starting with {value!r}")
+
+    def raw_expression(self):
+        """Consume an expression up to the end of its line; return its source tokens."""
+        depth, parts = 0, []
+        while True:
+            kind, value = self.peek()
+            if kind == "eof" or (depth == 0 and (kind == "newline" or (kind, value) == ("punct", "}"))):
+                return Expression("".join(str(part) for part in parts))
+            self.next()
+            if kind == "punct" and value in "([{":
+                depth += 1
+            elif kind == "punct" and value in ")]}":
+                depth -= 1
+            if kind != "newline":
+                parts.append(f'"{value}"' if kind == "string" else value)
+
+    def skip_block(self):
+        """Skip a block body; the opening brace has already been consumed."""
+        depth = 1
+        while depth:
+            kind, value = self.next()
+            if kind == "eof":
+                raise ConfigError("unterminated block")
+            if (kind, value) == ("punct", "{"):
+                depth += 1
+            elif (kind, value) == ("punct", "}"):
+                depth -= 1
+
+    def body(self, wanted):
+        """Parse a block body into {attribute: value or raw source}.
+
+        Attributes named in ``wanted`` map to a parser: "value" for literals,
+        "raw" for expressions such as type constraints.  Nested blocks are
+        skipped.
+        """
+        attributes = {}
+        while True:
+            self.skip_newlines()
+            kind, value = self.next()
+            if (kind, value) == ("punct", "}") or kind == "eof":
+                return attributes
+            if kind != "ident":
+                raise ConfigError(f"unexpected {value!r}")
+            if self.peek() == ("punct", "="):
+                self.next()
+                how = wanted.get(value)
+                if how == "value":
+                    attributes[value] = self.attribute()
+                elif how == "raw":
+                    attributes[value] = self.raw_expression()
+                else:
+                    self.raw_expression()
+            else:
+                while self.peek()[0] in ("ident", "string"):
+                    self.next()
+                self.expect("punct", "{")
+                self.skip_block()
+
+    def attribute(self):
+        """Parse an attribute value: a literal, or an Expression if it is not one."""
+        start = self.pos
+        try:
+            value = self.value()
+            if self.peek()[0] not in ("newline", "eof") and self.peek() != ("punct", "}"):
+                raise ConfigError("not a literal")
+            return value
+        except ConfigError:
+            self.pos = start
+            return self.raw_expression()
+
+    def block(self):
+        """Parse a whole block body; nested blocks become lists under their name."""
+        attributes = {}
+        while True:
+            self.skip_newlines()
+            kind, value = self.next()
+            if (kind, value) == ("punct", "}") or kind == "eof":
+                return attributes
+            if kind != "ident":
+                raise ConfigError(f"unexpected {value!r}")
+            if self.peek() == ("punct", "="):
+                self.next()
+                attributes[value] = self.attribute()
+            else:
+                while self.peek()[0] in ("ident", "string"):
+                    self.next()
+                self.expect("punct", "{")
+                attributes.setdefault(value, []).append(self.block())
+
+    def blocks(self):
+        """Return [(block type, labels, attributes)] for a .tf file."""
+        blocks = []
+        while True:
+            self.skip_newlines()
+            kind, value = self.next()
+            if kind == "eof":
+                return blocks
+            labels = []
+            while self.peek()[0] in ("ident", "string"):
+                labels.append(self.next()[1])
+            self.expect("punct", "{")
+            blocks.append((value, labels, self.block()))
+
+    def tfvars(self):
+        values = {}
+        while True:
+            self.skip_newlines()
+            kind, name = self.next()
+            if kind == "eof":
+                return values
+            if kind != "ident":
+                raise ConfigError(f"expected a variable name, found {name!r}")
+            self.expect("punct", "=")
+            values[name] = self.value()
+            if self.peek()[0] not in ("newline", "eof"):
+                raise ConfigError(f"unexpected {self.peek()[1]!r} after {name}")
+
+    def declarations(self):
+        """Return ({name: Variable}, AWS provider region) from a .tf file."""
+        variables, region = {}, None
+        while True:
+            self.skip_newlines()
+            kind, value = self.next()
+            if kind == "eof":
+                return variables, region
+            labels = []
+            while self.peek()[0] in ("ident", "string"):
+                labels.append(self.next()[1])
+            if self.peek() == ("punct", "="):
+                self.next()
+                self.raw_expression()
+                continue
+            self.expect("punct", "{")
+            if value == "variable" and labels:
+                attributes = self.body({"default": "value", "type": "raw", "description": "value"})
+                variables[labels[0]] = Variable(
+                    labels[0],
+                    type=attributes.get("type"),
+                    default=attributes.get("default"),
+                    has_default="default" in attributes,
+                    description=attributes.get("description"),
+                )
+            elif value == "provider" and labels == ["aws"]:
+                attributes = self.body({"region": "value", "alias": "value"})
+                literal = isinstance(attributes.get("region"), str) and not isinstance(attributes["region"], Expression)
+                if "alias" not in attributes and literal and "${" not in attributes["region"]:
+                    region = region or attributes["region"]
+            else:
+                self.skip_block()
+
+
+def parse_tfvars(text):
+    return _Parser(text).tfvars()
+
+
+def parse_declarations(text):
+    return _Parser(text).declarations()
+
+
+def parse_blocks(text):
+    return _Parser(text).blocks()
+
+
+def parse_attribute(text):
+    return _Parser(text).attribute()
+
+
+# --- type conversion ------------------------------------------------------
+
+def _split_type(type_expr):
+    """Split ``list(string)`` into ("list", "string")."""
+    match = re.fullmatch(r"(\w+)\((.*)\)", type_expr)
+    return (match.group(1), match.group(2)) if match else (type_expr, None)
+
+
+def convert(value, type_expr):
+    """Convert a value to a Terraform type constraint, as Terraform would."""
+    if type_expr is None or value is None:
+        return value
+    kind, element = _split_type(type_expr.replace(" ", ""))
+    if kind == "string":
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, str):
+            return value
+        raise ConfigError(f"a string is required, got {type(value).__name__}")
+    if kind == "number":
+        if isinstance(value, bool):
+            raise ConfigError("a number is required")
+        if isinstance(value, (int, float)):
+            return value
+        try:
+            return float(value) if any(ch in value for ch in ".eE") else int(value)
+        except (TypeError, ValueError):
+            raise ConfigError(f"a number is required, got {value!r}")
+    if kind == "bool":
+        if isinstance(value, bool):
+            return value
+        if value in ("true", "false"):
+            return value == "true"
+        raise ConfigError(f"a bool is required, got {value!r}")
+    if kind in ("list", "set", "tuple"):
+        if not isinstance(value, list):
+            raise ConfigError(f"a {kind} is required")
+        return [convert(item, element if kind != "tuple" else None) for item in value]
+    if kind in ("map", "object"):
+        if not isinstance(value, dict):
+            raise ConfigError(f"a {kind} is required")
+        return {key: convert(item, element if kind == "map" else None) for key, item in value.items()}
+    return value
+
+
+# --- loading --------------------------------------------------------------
+
+_cache = {}
+
+
+def _files(directory):
+    tf = sorted(path for path in glob.glob(os.path.join(directory, "*.tf")) if os.path.basename(path) != tags.OVERRIDE_FILE)
+    tfvars = []
+    for pattern in TFVARS_PATTERNS:
+        tfvars.extend(sorted(glob.glob(os.path.join(directory, pattern))))
+    return tf, tfvars
+
+
+def load(directory="."):
+    """Return the LabConfig for a directory, memoized by the files' contents."""
+    tf_files, tfvars_files = _files(directory)
+    contents = {}
+    digest = hashlib.sha256()
+    for path in tf_files + tfvars_files:
+        with open(path) as f:
+            contents[path] = f.read()
+        digest.update(path.encode() + b"\0" + contents[path].encode() + b"\0")
+    digest = digest.hexdigest()
+    if digest in _cache:
+        return _cache[digest]
+
+    # A syntax error in the .tfvars is the student's; one in the .tf files may
+    # just be HCL this parser does not cover, so fall back to the tfvars alone
+    tfvars = {}
+    for path in tfvars_files:
+        try:
+            tfvars.update(parse_tfvars(contents[path]))
+        except ConfigError as e:
+            raise ConfigError(f"{os.path.basename(path)}: {e}")
+
+    declared, region, parsed = {}, None, True
+    try:
+        for path in tf_files:
+            variables, file_region = parse_declarations(contents[path])
+            declared.update(variables)
+            region = region or file_region
+    except ConfigError:
+        declared, region, parsed = {}, None, False
+
+    config = LabConfig(digest, declared, tfvars, region, parsed)
+    _cache[digest] = config
+    return config
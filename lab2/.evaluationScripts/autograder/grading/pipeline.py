@@ -0,0 +1,212 @@
+"""Pipelined verification while ``terraform apply`` runs (``GRADER_PIPELINE=1``).
+
+:func:`apply` runs ``terraform apply -json`` and reads its progress events.
+Each ``apply_complete`` event marks a resource address as created.  A check
+is started on a worker thread as soon as every address it depends on has
+been created, so checks on fast resources (a security group, a VPC) overlap
+with the slow tail of the apply (an instance running its user data).
+
+The addresses a check waits for come from the submission's own ``*.tf``
+files: the resource behind the check's output, everything that resource
+references, and the attachment resources (routes, route table
+associations, security group rules) that modify it, repeated until nothing
+new is added.  Checks without an output key or on resources created with
+``count``/``for_each`` are not started early.
+
+While the apply runs, ``ctx.outputs`` only holds the ``<address>.id``
+outputs of created resources.  A predicate that reads any other output
+raises :class:`NotReady` and is simply run again after the apply.  Only
+passing early results are kept: a failure may just be AWS's eventual
+consistency, so those checks are re-run against the snapshot as well.  A
+pass records when each resource it read was fetched; the engine reuses it
+only if the frozen snapshot holds those same fetches.
+"""
+import json
+import re
+import threading
+import time
+
+from . import config, timeouts
+
+WORKERS = 4
+
+# Resources that change another resource the checks inspect, rather than
+# being inspected themselves
+MODIFIERS = {
+    "aws_route",
+    "aws_route_table_association",
+    "aws_main_route_table_association",
+    "aws_internet_gateway_attachment",
+    "aws_security_group_rule",
+    "aws_vpc_security_group_ingress_rule",
+    "aws_vpc_security_group_egress_rule",
+}
+
+_ADDRESS = re.compile(r"\b([a-z][a-z0-9_]*\.[A-Za-z_][A-Za-z0-9_-]*)\b")
+_OUTPUT = re.compile(r"([a-z][a-z0-9_]*\.[A-Za-z_][A-Za-z0-9_-]*)\.([A-Za-z_][A-Za-z0-9_]*)")
+_INDEX = re.compile(r"\[[^\]]*\]$")
+
+
+class NotReady(BaseException):
+    """An output a predicate read is not known until the apply finishes.
+
+    A BaseException, like ``timeouts.GradingCancelled``, so the predicates'
+    own ``except Exception`` blocks do not turn it into a failure.
+    """
+
+
+class PendingOutputs(dict):
+    """Outputs known so far; reading a lab output that is not yet known raises NotReady."""
+
+    def __init__(self, names):
+        super().__init__()
+        self.names = set(names)
+
+    def __getitem__(self, name):
+        if name in self.names and name not in self:
+            raise NotReady(name)
+        return super().__getitem__(name)
+
+    def get(self, name, default=None):
+        if name in self.names and name not in self:
+            raise NotReady(name)
+        return super().get(name, default)
+
+
+def resource_graph(directory="."):
+    """Parse the submission into ``(resources, outputs)``.
+
+    ``resources`` maps each root resource address to ``(references,
+    counted)``; ``outputs`` maps output names to ``(address, attribute)``
+    for outputs that are a plain resource attribute.
+    """
+    blocks = []
+    for path in config._files(directory)[0]:
+        with open(path) as f:
+            blocks += config.parse_blocks(f.read())
+
+    addresses = {".".join(labels) for block_type, labels, _ in blocks if block_type == "resource" and len(labels) == 2}
+    resources, outputs = {}, {}
+    for block_type, labels, attributes in blocks:
+        if block_type == "resource" and len(labels) == 2:
+            text = json.dumps(attributes)
+            references = {match for match in _ADDRESS.findall(text) if match in addresses}
+            resources[".".join(labels)] = (references, "count" in attributes or "for_each" in attributes)
+        elif block_type == "output" and labels:
+            value = attributes.get("value")
+            match = _OUTPUT.fullmatch(value) if isinstance(value, config.Expression) else None
+            if match and match.group(1) in addresses:
+                outputs[labels[0]] = (match.group(1), match.group(2))
+    return resources, outputs
+
+
+def waits_for(address, resources):
+    """Every address that must exist before the resource at ``address`` can be judged."""
+    wanted = {address}
+    while True:
+        grown = set(wanted)
+        for name in wanted:
+            grown |= resources.get(name, (set(), False))[0]
+        for name, (references, _) in resources.items():
+            if name.split(".")[0] in MODIFIERS and references & wanted:
+                grown.add(name)
+        if grown == wanted:
+            return wanted
+        wanted = grown
+
+
+class Pipeline:
+    """Starts checks on worker threads as the resources they need are created."""
+
+    def __init__(self, lab_checks, ctx, resources, outputs):
+        # Imported here: concurrent.futures pulls in logging, which a run
+        # without pipelining never needs
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.ctx = ctx
+        self.outputs = outputs
+        self.created = set()
+        # Checks are keyed by position, since a testid may repeat
+        self.waiting = {}
+        for index, check in enumerate(lab_checks):
+            if check.resource is None or not isinstance(check.key, str) or check.key not in outputs:
+                continue
+            wanted = waits_for(outputs[check.key][0], resources)
+            if not any(resources.get(name, (set(), True))[1] for name in wanted):
+                self.waiting[index] = (check, wanted)
+        # str(index) -> (passed, message, seconds, judged) of checks that passed
+        # early; string keys, like the check results in the checkpoint
+        self.results = {}
+        self.deferred = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=WORKERS)
+
+    def on_line(self, line):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return
+        if event.get("type") != "apply_complete" or event.get("hook", {}).get("action") != "create":
+            return
+        hook = event["hook"]
+        address = _INDEX.sub("", hook["resource"]["addr"])
+        self.created.add(address)
+        for name, (output_address, attribute) in self.outputs.items():
+            if output_address == address and attribute == hook.get("id_key"):
+                self.ctx.outputs[name] = hook.get("id_value")
+
+        for index, (check, wanted) in list(self.waiting.items()):
+            if wanted <= self.created:
+                del self.waiting[index]
+                self._executor.submit(self._evaluate, index, check)
+
+    def _evaluate(self, index, check):
+        started = time.monotonic()
+        try:
+            resource_id = check.resource_id(self.ctx)
+            resource = self.ctx.get(check.resource, resource_id)
+            passed, message = check.predicate(resource, self.ctx)
+        except (NotReady, timeouts.StageTimeout, Exception):
+            passed, message = False, None
+        with self._lock:
+            if passed:
+                # [type, ID, fetch time] of what the predicate may have read
+                judged = [[resource_type, resource_id, self.ctx.fetched_at[(resource_type, resource_id)]] for resource_type in (check.resource,) + check.related if (resource_type, resource_id) in self.ctx.fetched_at]
+                self.results[str(index)] = (passed, message, time.monotonic() - started, judged)
+            else:
+                self.deferred.append(check)
+
+    def finish(self):
+        """Wait for the started checks; forget what the deferred ones fetched."""
+        self._executor.shutdown(wait=True)
+        for check in self.deferred:
+            try:
+                resource_id = check.resource_id(self.ctx)
+            except NotReady:
+                continue
+            for resource_type in (check.resource,) + check.related:
+                self.ctx.invalidate(resource_type, resource_id)
+
+
+def apply(lab, ctx, deadline, plan_file=None):
+    """``terraform apply`` with checks started as their resources are created.
+
+    Returns ``{str(index): (passed, message, seconds, judged)}`` for the checks that
+    passed while the apply ran.  A submission the resource graph cannot be
+    read from is applied without pipelining.  ``plan_file`` applies a saved
+    plan instead of planning again.
+    """
+    saved_plan = [plan_file] if plan_file else []
+    try:
+        resources, outputs = resource_graph()
+    except config.ConfigError as e:
+        print(f"Not pipelining checks, the configuration could not be read: {e}")
+        timeouts.run(["terraform", "apply", "-auto-approve"] + saved_plan, deadline, "terraform apply", lab.stage_budgets.get("apply"), check=True)
+        return {}
+
+    pipeline = Pipeline(lab.checks, ctx, resources, outputs)
+    try:
+        timeouts.stream(["terraform", "apply", "-auto-approve", "-json"] + saved_plan, deadline, "terraform apply", lab.stage_budgets.get("apply"), pipeline.on_line)
+    finally:
+        pipeline.finish()
+    return pipeline.results
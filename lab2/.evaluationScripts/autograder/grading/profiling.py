@@ -0,0 +1,87 @@
+"""Opt-in profiling of a grading run (``GRADER_PROFILE=1`` or ``grader.sh --profile``).
+
+The run is executed under cProfile and two artifacts are written next to
+``evaluate.json``:
+
+* ``evaluate.prof``: the raw profile, for ``python3 -m pstats`` or snakeviz;
+* ``evaluate.profile.txt``: wall time against the grader's own CPU time and
+  the CPU time of its children (terraform, kubectl, aws), the profiled time
+  split by where it went (grader code, JSON, the AWS SDK, network and
+  subprocess waits, sleeps), and the slowest functions.
+
+cProfile only sees the main thread; time spent in worker threads shows up as
+the main thread waiting for them.  When profiling is off nothing but the
+environment check runs.
+"""
+import resource
+import time
+
+TOP_FUNCTIONS = 30
+
+# First match wins, so the more specific waits come before the SDK packages
+CATEGORIES = [
+    ("sleep", ("<built-in method time.sleep>",)),
+    ("subprocess wait", ("subprocess.py", "selectors.py", "<method 'poll' of", "<built-in method posix.waitpid>")),
+    ("network wait", ("socket.py", "ssl.py", "http/client.py", "<method 'recv", "<method 'read' of '_ssl", "<method 'connect' of", "<built-in method _socket.")),
+    ("json", ("json/", "<built-in method _json.")),
+    ("aws sdk", ("botocore/", "boto3/", "s3transfer/", "urllib3/")),
+]
+
+
+def _category(filename, name):
+    where = f"{filename}:{name}" if filename != "~" else name
+    for category, markers in CATEGORIES:
+        if any(marker in where for marker in markers):
+            return category
+    return "grader/python"
+
+
+def breakdown(stats):
+    """Self time per category from a pstats.Stats object."""
+    totals = {}
+    for (filename, _, name), (_, _, tottime, _, _) in stats.stats.items():
+        category = _category(filename, name)
+        totals[category] = totals.get(category, 0.0) + tottime
+    return totals
+
+
+def profile(func, *args, output_prefix="evaluate"):
+    """Call ``func(*args)`` under cProfile and write the profile artifacts."""
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        wall = time.perf_counter() - started
+        self_after = resource.getrusage(resource.RUSAGE_SELF)
+        children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = (self_after.ru_utime - self_before.ru_utime) + (self_after.ru_stime - self_before.ru_stime)
+        children = (children_after.ru_utime - children_before.ru_utime) + (children_after.ru_stime - children_before.ru_stime)
+
+        try:
+            profiler.dump_stats(f"{output_prefix}.prof")
+            top = io.StringIO()
+            stats = pstats.Stats(profiler, stream=top)
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+            lines = [
+                f"wall time            {wall:9.2f}s",
+                f"grader CPU           {cpu:9.2f}s  ({cpu / wall:.0%} of wall)" if wall else f"grader CPU           {cpu:9.2f}s",
+                f"children CPU         {children:9.2f}s  (terraform, kubectl, aws CLI)",
+                f"waiting (wall - CPU) {max(0.0, wall - cpu):9.2f}s",
+                "",
+                "profiled self time by category:",
+            ]
+            for category, seconds in sorted(breakdown(stats).items(), key=lambda item: -item[1]):
+                lines.append(f"  {category:<18} {seconds:9.2f}s")
+            lines += ["", f"top {TOP_FUNCTIONS} functions by cumulative time:", top.getvalue()]
+            with open(f"{output_prefix}.profile.txt", 'w') as f:
+                f.write("\n".join(lines))
+        except Exception as e:
+            print(f"Could not write the profile: {e}")
@@ -0,0 +1,199 @@
+"""Deadline budgets and cooperative cancellation for a grading run.
+
+A run gets one :class:`Deadline` for the whole lab and every stage (terraform
+init/apply, aws CLI, kubectl, HTTP probes) asks it for a timeout that fits
+both the stage budget and what is left of the lab budget.  When a budget runs
+out, :class:`StageTimeout` is raised; when the grader receives SIGTERM (a
+container stop or restart), :class:`Interrupted`.  Both are
+:class:`GradingCancelled`.  It
+derives from ``BaseException`` so the ``except Exception`` blocks inside the
+checks do not swallow it; ``main()`` catches it, marks the checks that did not
+run and still writes a complete ``evaluate.json``.
+"""
+import os
+import signal
+import subprocess
+import threading
+import time
+
+from . import metrics
+
+KILL_GRACE_SECONDS = 10
+
+
+class GradingCancelled(BaseException):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Interrupted(GradingCancelled):
+    """The grader was stopped from outside; unlike a spent budget, the run can resume."""
+
+
+class StageTimeout(GradingCancelled):
+    def __init__(self, stage, seconds):
+        super().__init__(f"{stage} timed out after {seconds:.0f}s")
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, budget):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, stage, budget=None):
+        """Return the timeout for a stage, raising StageTimeout if none is left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise StageTimeout("grading", self.budget)
+        return remaining if budget is None else min(budget, remaining)
+
+    def check(self, stage):
+        if self.remaining() <= 0:
+            raise StageTimeout(stage, self.budget)
+
+    def install_signal_handlers(self):
+        """Cancel on SIGTERM, and via SIGALRM once the lab budget is spent.
+
+        The alarm is a backstop for calls that cannot take a timeout; it only
+        fires if the cooperative checks have not already stopped the run.
+        """
+        def on_term(signum, frame):
+            raise Interrupted("grader was terminated")
+
+        def on_alarm(signum, frame):
+            raise StageTimeout("grading", self.budget)
+
+        signal.signal(signal.SIGTERM, on_term)
+        signal.signal(signal.SIGALRM, on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, self.budget)
+
+    def disarm(self):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def kill_process_group(proc, grace=KILL_GRACE_SECONDS):
+    """Stop a child started in its own session, together with its children.
+
+    SIGTERM first so terraform can stop gracefully and persist its state for
+    the teardown, then SIGKILL if it has not exited after ``grace`` seconds.
+    """
+    if proc.poll() is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+
+
+def run(cmd, deadline, stage, budget=None, check=False, capture_output=False, stdout=None, stderr=None, text=True, ok_returncodes=(0,), cwd=None):
+    """subprocess.run() with a stage timeout and process-group cleanup.
+
+    ``ok_returncodes`` lists the exit codes that are not failures, for
+    commands such as ``terraform plan -detailed-exitcode``.
+    """
+    timeout = deadline.timeout(stage, budget)
+    if capture_output:
+        stdout = stderr = subprocess.PIPE
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, stdout=stdout, stderr=stderr, text=text, cwd=cwd, start_new_session=True)
+    try:
+        out, err = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_process_group(proc)
+        _record(cmd, stage, started, failed=True)
+        raise StageTimeout(stage, timeout)
+    except BaseException:
+        kill_process_group(proc)
+        _record(cmd, stage, started, failed=True)
+        raise
+
+    failed = proc.returncode not in ok_returncodes
+    _record(cmd, stage, started, failed=failed)
+    if check and failed:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, out, err)
+    return subprocess.CompletedProcess(cmd, proc.returncode, out, err)
+
+
+def stream(cmd, deadline, stage, budget, on_line):
+    """Run a command with check=True, passing each line of its output to on_line().
+
+    stderr is merged into stdout.  The stage timeout is enforced by a timer
+    that kills the process group, so a silent command cannot block the read.
+    """
+    timeout = deadline.timeout(stage, budget)
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, start_new_session=True)
+    expired = threading.Event()
+
+    def expire():
+        expired.set()
+        kill_process_group(proc)
+
+    timer = threading.Timer(timeout, expire)
+    timer.start()
+    lines = []
+    try:
+        for line in proc.stdout:
+            lines.append(line)
+            on_line(line)
+        proc.wait()
+    except BaseException:
+        kill_process_group(proc)
+        _record(cmd, stage, started, failed=True)
+        raise
+    finally:
+        timer.cancel()
+
+    if expired.is_set():
+        _record(cmd, stage, started, failed=True)
+        raise StageTimeout(stage, timeout)
+    _record(cmd, stage, started, failed=proc.returncode != 0)
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, "".join(lines))
+    return subprocess.CompletedProcess(cmd, proc.returncode, "".join(lines))
+
+
+def _record(cmd, stage, started, failed):
+    metrics.observe("grader_stage_duration_seconds", time.monotonic() - started, {"stage": stage})
+    if failed and cmd[0] == "terraform":
+        metrics.inc("grader_terraform_failures_total", {"command": cmd[1]})
+
+
+def check_output(cmd, deadline, stage, budget=None, stderr=None):
+    return run(cmd, deadline, stage, budget, check=True, stdout=subprocess.PIPE, stderr=stderr).stdout
+
+
+def aws_config():
+    """botocore config with bounded connect/read timeouts and retries."""
+    from botocore.config import Config
+    return Config(connect_timeout=10, read_timeout=60, retries={"max_attempts": 5, "mode": "standard"})
+
+
+def mark_not_run(data, expected, reason):
+    """Append a timed-out result for every expected check missing from data.
+
+    ``expected`` lists ``(testid, maximum marks)`` in order.
+    """
+    seen = {}
+    for result in data:
+        seen[result["testid"]] = seen.get(result["testid"], 0) + 1
+    for testid, marks in expected:
+        if seen.get(testid):
+            seen[testid] -= 1
+            continue
+        data.append({
+            "testid": testid,
+            "status": "failure",
+            "score": 0,
+            "maximum marks": marks,
+            "message": f"Grading stopped ({reason}). {testid} was not run."
+        })
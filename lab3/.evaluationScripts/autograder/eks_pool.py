@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+# Clusters that belong to the pre-warmed pool carry POOL_TAG=<pool name>.
+# A grader that is using one of them writes LEASE_TAG=<owner>@<expiry epoch>
+# and removes it again when the functionality check is finished.  An expired
+# lease (crashed grader) is treated as free, so the pool recycles itself.
+#
+# Leases are advisory.  EKS tags have no compare-and-set, so two graders that
+# race for the same free cluster can both end up using it.  That is harmless:
+# the functionality check only reads the cluster (kubectl get nodes).  The
+# lease spreads graders across the pool and shows who is using what.
+#
+# The instructor creates the pool clusters and tags them; nothing here
+# provisions or replenishes them.
+POOL_TAG = "autograder-pool"
+LEASE_TAG = "autograder-lease"
+DEFAULT_POOL = "lab3"
+LEASE_SECONDS = 900
+
+
+def parse_lease(value):
+    try:
+        owner, expiry = value.rsplit("@", 1)
+        return owner, float(expiry)
+    except (AttributeError, ValueError):
+        return None, 0.0
+
+
+def list_pool_clusters(eks_client, tagging_client, pool=DEFAULT_POOL):
+    # Find the pool's clusters by tag, so only those are described and not
+    # every cluster in the account
+    clusters = []
+    paginator = tagging_client.get_paginator("get_resources")
+    for page in paginator.paginate(TagFilters=[{"Key": POOL_TAG, "Values": [pool]}], ResourceTypeFilters=["eks:cluster"]):
+        for mapping in page["ResourceTagMappingList"]:
+            name = mapping["ResourceARN"].rsplit("/", 1)[-1]
+            clusters.append(eks_client.describe_cluster(name=name)["cluster"])
+    return clusters
+
+
+def acquire(eks_client, tagging_client, pool=DEFAULT_POOL, lease_seconds=LEASE_SECONDS):
+    """Lease a free ACTIVE cluster from the pool; returns (name, lease) or (None, None)."""
+    owner = uuid.uuid4().hex
+    for cluster in list_pool_clusters(eks_client, tagging_client, pool):
+        if cluster["status"] != "ACTIVE":
+            continue
+        _, expiry = parse_lease(cluster.get("tags", {}).get(LEASE_TAG))
+        if expiry > time.time():
+            continue
+
+        lease = f"{owner}@{time.time() + lease_seconds:.0f}"
+        eks_client.tag_resource(resourceArn=cluster["arn"], tags={LEASE_TAG: lease})
+
+        # Move on if another grader's lease overwrote ours in between.  This
+        # narrows the race but cannot close it (see the note at the top).
+        # (tag_resource also clears the grader's response cache, so this
+        # re-read goes to the API.)
+        current = eks_client.describe_cluster(name=cluster["name"])["cluster"]
+        if current.get("tags", {}).get(LEASE_TAG) == lease:
+            return cluster["name"], lease
+    return None, None
+
+
+def release(eks_client, cluster_name, lease=None):
+    """Remove the lease on a cluster, only if it is still ``lease`` when one is given."""
+    cluster = eks_client.describe_cluster(name=cluster_name)["cluster"]
+    if lease is not None and cluster.get("tags", {}).get(LEASE_TAG) != lease:
+        # Our lease expired and another grader holds the cluster now
+        return
+    eks_client.untag_resource(resourceArn=cluster["arn"], tagKeys=[LEASE_TAG])
+
+
+@contextmanager
+def leased_cluster(eks_client, tagging_client, pool=DEFAULT_POOL, lease_seconds=LEASE_SECONDS):
+    cluster_name, lease = acquire(eks_client, tagging_client, pool, lease_seconds)
+    try:
+        yield cluster_name
+    finally:
+        if cluster_name is not None:
+            try:
+                release(eks_client, cluster_name, lease)
+            except Exception as e:
+                print(f"Failed to release pooled cluster {cluster_name}: {e}")
+
+
+def main(argv):
+    """Instructor helper: `eks_pool.py status` or `eks_pool.py release NAME`."""
+    # The grader passes in its own clients, so boto3 is only needed here
+    import boto3
+    from grading import golden
+
+    # The pool lives in the lab's region, the one the solution's provider names
+    region = golden.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), golden.MANIFEST)).provider_region
+    eks_client = boto3.client("eks", region_name=region)
+    tagging_client = boto3.client("resourcegroupstaggingapi", region_name=region)
+    command = argv[1] if len(argv) > 1 else "status"
+
+    if command == "status":
+        for cluster in list_pool_clusters(eks_client, tagging_client):
+            owner, expiry = parse_lease(cluster.get("tags", {}).get(LEASE_TAG))
+            if expiry > time.time():
+                lease = f"leased by {owner} for {expiry - time.time():.0f}s"
+            else:
+                lease = "free"
+            print(f"{cluster['name']}\t{cluster['status']}\t{lease}")
+    elif command == "release" and len(argv) > 2:
+        # Frees the cluster whoever holds it
+        release(eks_client, argv[2])
+    else:
+        print("usage: eks_pool.py [status | release CLUSTER_NAME]")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,3 +1,8 @@
 #! /bin/bash
 
-python3 autograder.py
+# grader.sh --profile writes evaluate.prof and evaluate.profile.txt next to evaluate.json
+if [ "$1" = "--profile" ]; then
+    export GRADER_PROFILE=1
+fi
+
+exec python3 "$(dirname "$0")/autograder.py"
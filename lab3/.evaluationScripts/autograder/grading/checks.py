@@ -0,0 +1,148 @@
+"""Declarative check definitions shared by the lab autograders.
+
+A lab describes each check as a :class:`Check`: the testid shown to the
+student, the resource type it inspects (a key of ``grading.fetch.FETCHERS``),
+the Terraform output holding the resource ID, a predicate and its marks.  The
+engine fetches the resources of all checks in batched calls, evaluates the
+predicates in order and generates the "skipped" results itself.
+
+Predicates take ``(resource, ctx)`` and return ``(passed, message)``.  If one
+raises, the check fails with its ``error`` message.  Skip messages name the
+check by its ``label`` (the testid without " Verification"); ``skipped`` holds
+whole messages for checks whose wording differs, keyed by the failed
+prerequisite's testid.  Expected values passed to
+the factories below may be constants, :func:`output`/:func:`var` lookups, or
+a list of those that must all match.
+"""
+
+
+class Check:
+    def __init__(self, testid, predicate, resource=None, key=None, related=(), requires=(), marks=1, error="An error occurred: {}", label=None, skipped=None):
+        self.testid = testid
+        self.predicate = predicate
+        self.resource = resource
+        self.key = key
+        self.related = tuple(related)
+        self.requires = tuple(requires)
+        self.marks = marks
+        self.error = error
+        self._label = label
+        self.skipped = skipped or {}
+
+    @property
+    def label(self):
+        return self._label or label(self.testid)
+
+    def resource_id(self, ctx):
+        if self.resource is None:
+            return None
+        return resolve(self.key, ctx) if callable(self.key) else ctx.outputs.get(self.key)
+
+
+def label(testid):
+    """'VPC Verification' -> 'VPC', as used in the skip messages."""
+    return testid[:-len(" Verification")] if testid.endswith(" Verification") else testid
+
+
+def output(name):
+    return lambda ctx: ctx.outputs.get(name)
+
+
+def var(name):
+    return lambda ctx: ctx.tfvars.get(name)
+
+
+def resolve(value, ctx):
+    return value(ctx) if callable(value) else value
+
+
+def matches(actual, expected, ctx):
+    if isinstance(expected, list):
+        return all(actual == resolve(value, ctx) for value in expected)
+    return actual == resolve(expected, ctx)
+
+
+def has_igw_route(route_table, igw_id):
+    return any(
+        route.get('DestinationCidrBlock') == '0.0.0.0/0' and
+        route.get('GatewayId') == igw_id
+        for route in route_table['Routes']
+    )
+
+
+def vpc_check(cidr, key="vpc_id", **kwargs):
+    def predicate(vpc, ctx):
+        if matches(vpc["CidrBlock"], cidr, ctx):
+            return True, "VPC configuration is correct."
+        return False, "VPC CIDR block does not match expected value."
+
+    return Check("VPC Verification", predicate, resource="vpc", key=key, error="Error verifying VPC: {}", **kwargs)
+
+
+def _subnet_predicate(kind, cidr, az, vpc_id, igw_id, public):
+    def predicate(subnet, ctx):
+        if subnet['VpcId'] != resolve(vpc_id, ctx):
+            return False, f"{kind} subnet does not belong to the expected VPC."
+        if not matches(subnet['CidrBlock'], cidr, ctx):
+            return False, f"{kind} subnet CIDR block does not match the expected value."
+        if not matches(subnet['AvailabilityZone'], az, ctx):
+            return False, f"{kind} subnet Availability Zone does not match the expected value."
+
+        route_table = ctx.get("subnet_route_table", subnet['SubnetId'])
+        if public:
+            if route_table is None:
+                return False, "Public subnet is not associated with any route table."
+            if not has_igw_route(route_table, resolve(igw_id, ctx)):
+                return False, "Public subnet does not have a route to the Internet Gateway."
+        elif route_table is not None and has_igw_route(route_table, resolve(igw_id, ctx)):
+            return False, "Private subnet incorrectly has a route to the Internet Gateway."
+        return True, f"{kind} subnet is correctly configured."
+
+    return predicate
+
+
+def public_subnet_check(key, cidr, az, vpc_id=output("vpc_id"), igw_id=output("igw_id"), **kwargs):
+    predicate = _subnet_predicate("Public", cidr, az, vpc_id, igw_id, public=True)
+    return Check("Public Subnet Verification", predicate, resource="subnet", key=key, related=["subnet_route_table"], **kwargs)
+
+
+def private_subnet_check(key, cidr, az, vpc_id=output("vpc_id"), igw_id=output("igw_id"), **kwargs):
+    predicate = _subnet_predicate("Private", cidr, az, vpc_id, igw_id, public=False)
+    return Check("Private Subnet Verification", predicate, resource="subnet", key=key, related=["subnet_route_table"], **kwargs)
+
+
+def internet_gateway_check(key="igw_id", vpc_id=output("vpc_id"), **kwargs):
+    def predicate(igw, ctx):
+        if any(attachment["VpcId"] == resolve(vpc_id, ctx) for attachment in igw["Attachments"]):
+            return True, "Internet Gateway is attached to the correct VPC."
+        return False, "Internet Gateway is not correctly attached."
+
+    return Check("Internet Gateway Verification", predicate, resource="internet_gateway", key=key, error="Error verifying Internet Gateway: {}", **kwargs)
+
+
+def route_table_check(key="route_table_id", vpc_id=output("vpc_id"), igw_id=output("igw_id"), **kwargs):
+    def predicate(route_table, ctx):
+        if route_table['VpcId'] != resolve(vpc_id, ctx):
+            return False, "Route table does not belong to the expected VPC."
+        # Check if a route exists for internet access via the IGW
+        if has_igw_route(route_table, resolve(igw_id, ctx)):
+            return True, "Route table is correctly configured with an Internet Gateway route."
+        return False, "Route table does not have a correct route to the Internet Gateway."
+
+    return Check("Route Table Verification", predicate, resource="route_table", key=key, **kwargs)
+
+
+def security_group_check(key, vpc_id=output("vpc_id"), **kwargs):
+    def predicate(security_group, ctx):
+        if security_group['VpcId'] != resolve(vpc_id, ctx):
+            return False, "Security group VPC ID does not match the expected value."
+
+        ingress_rules = security_group['IpPermissions']
+        egress_rules = security_group['IpPermissionsEgress']
+        if not any(rule.get('FromPort') == 80 and rule.get('ToPort') == 80 and '0.0.0.0/0' in [ip['CidrIp'] for ip in rule['IpRanges']] for rule in ingress_rules):
+            return False, "Ingress rules do not match the expected configuration."
+        if not any(rule['IpProtocol'] == '-1' and '0.0.0.0/0' in [ip['CidrIp'] for ip in rule['IpRanges']] for rule in egress_rules):
+            return False, "Egress rules do not match the expected configuration."
+        return True, "Security group matches the expected configuration."
+
+    return Check("Security Group Verification", predicate, resource="security_group", key=key, **kwargs)
@@ -0,0 +1,203 @@
+"""Batched fetchers for the resource types the checks inspect.
+
+Each fetcher takes ``(ctx, ids)`` and returns ``{id: resource}`` using as few
+API calls as possible (one ``describe_*`` call for all IDs of a type where the
+API allows it).  IDs that do not exist may simply be left out; the engine
+turns them into a "not found" error for the checks that need them.  Fetchers
+for optional relations map an ID to ``None`` instead.
+
+``SETTLING`` tells, per type, whether a fetched resource is still changing
+state; the engine re-fetches those before it freezes its snapshot.
+
+``STATE_FETCHERS`` answer the same lookups from a refreshed Terraform state
+(``ctx.state``, see ``grading.terraform.refresh_state``) in the shape the
+``describe_*`` calls return, so the predicates work unchanged on either.
+Only the fields the predicates read are filled in.
+"""
+from . import terraform
+
+
+def _describe(service, operation, id_param, result_key, id_field):
+    def fetch(ctx, ids):
+        response = getattr(ctx.client(service), operation)(**{id_param: list(ids)})
+        return {item[id_field]: item for item in response[result_key]}
+    return fetch
+
+
+def _instances(ctx, ids):
+    response = ctx.client("ec2").describe_instances(InstanceIds=list(ids))
+    return {
+        instance["InstanceId"]: instance
+        for reservation in response["Reservations"]
+        for instance in reservation["Instances"]
+    }
+
+
+def _subnet_route_tables(ctx, ids):
+    """Map each subnet ID to its explicitly associated route table, or None."""
+    response = ctx.client("ec2").describe_route_tables(
+        Filters=[{"Name": "association.subnet-id", "Values": list(ids)}]
+    )
+    found = {subnet_id: None for subnet_id in ids}
+    for route_table in response["RouteTables"]:
+        for association in route_table["Associations"]:
+            if association.get("SubnetId") in found:
+                found[association["SubnetId"]] = route_table
+    return found
+
+
+def _eks_clusters(ctx, names):
+    eks = ctx.client("eks")
+    return {name: eks.describe_cluster(name=name)["cluster"] for name in names}
+
+
+def _eks_nodegroups(ctx, keys):
+    """Keys are ``(cluster name, node group name)`` pairs."""
+    eks = ctx.client("eks")
+    return {
+        (cluster, nodegroup): eks.describe_nodegroup(clusterName=cluster, nodegroupName=nodegroup)["nodegroup"]
+        for cluster, nodegroup in keys
+    }
+
+
+def _planned_resources(ctx, resource_types):
+    """Planned values from ``terraform plan``, keyed by resource type, or None."""
+    planned = terraform.plan_resources(ctx.deadline, ctx.stage_budgets)
+    return {resource_type: planned.get(resource_type) for resource_type in resource_types}
+
+
+# Transitional states; any other state is one the checks can judge
+SETTLING = {
+    "vpc": lambda vpc: vpc.get("State") == "pending",
+    "subnet": lambda subnet: subnet.get("State") == "pending",
+    "internet_gateway": lambda igw: any(attachment.get("State") in ("attaching", "detaching") for attachment in igw.get("Attachments", [])),
+    "instance": lambda instance: instance.get("State", {}).get("Name") in ("pending", "stopping", "shutting-down"),
+    "eks_cluster": lambda cluster: cluster.get("status") in ("CREATING", "UPDATING"),
+    "eks_nodegroup": lambda nodegroup: nodegroup.get("status") in ("CREATING", "UPDATING"),
+}
+
+
+def settling(resource_type, resource):
+    """Whether a fetched resource is in a transitional state."""
+    return resource_type in SETTLING and SETTLING[resource_type](resource)
+
+
+FETCHERS = {
+    "vpc": _describe("ec2", "describe_vpcs", "VpcIds", "Vpcs", "VpcId"),
+    "subnet": _describe("ec2", "describe_subnets", "SubnetIds", "Subnets", "SubnetId"),
+    "internet_gateway": _describe("ec2", "describe_internet_gateways", "InternetGatewayIds", "InternetGateways", "InternetGatewayId"),
+    "route_table": _describe("ec2", "describe_route_tables", "RouteTableIds", "RouteTables", "RouteTableId"),
+    "security_group": _describe("ec2", "describe_security_groups", "GroupIds", "SecurityGroups", "GroupId"),
+    "instance": _instances,
+    "subnet_route_table": _subnet_route_tables,
+    "eks_cluster": _eks_clusters,
+    "eks_nodegroup": _eks_nodegroups,
+    "planned_resource": _planned_resources,
+}
+
+
+def _from_state(terraform_type, adapter):
+    def fetch(ctx, ids):
+        return {
+            values["id"]: adapter(values, ctx.state)
+            for values in ctx.state.get(terraform_type, [])
+            if values.get("id") in ids
+        }
+    return fetch
+
+
+def _state_vpc(vpc, state):
+    return {"VpcId": vpc["id"], "CidrBlock": vpc.get("cidr_block")}
+
+
+def _state_subnet(subnet, state):
+    return {
+        "SubnetId": subnet["id"],
+        "VpcId": subnet.get("vpc_id"),
+        "CidrBlock": subnet.get("cidr_block"),
+        "AvailabilityZone": subnet.get("availability_zone"),
+    }
+
+
+def _state_internet_gateway(igw, state):
+    attachments = [igw.get("vpc_id")] + [
+        attachment.get("vpc_id")
+        for attachment in state.get("aws_internet_gateway_attachment", [])
+        if attachment.get("internet_gateway_id") == igw["id"]
+    ]
+    return {
+        "InternetGatewayId": igw["id"],
+        "Attachments": [{"VpcId": vpc_id, "State": "available"} for vpc_id in attachments if vpc_id],
+    }
+
+
+def _state_route_table(route_table, state):
+    # The refreshed "route" attribute lists every live route, including the
+    # ones managed by separate aws_route resources
+    return {
+        "RouteTableId": route_table["id"],
+        "VpcId": route_table.get("vpc_id"),
+        "Routes": [
+            {"DestinationCidrBlock": route.get("cidr_block"), "GatewayId": route.get("gateway_id")}
+            for route in route_table.get("route") or []
+        ],
+        "Associations": [
+            {"RouteTableAssociationId": association["id"], "RouteTableId": route_table["id"], "SubnetId": association.get("subnet_id")}
+            for association in state.get("aws_route_table_association", [])
+            if association.get("route_table_id") == route_table["id"]
+        ],
+    }
+
+
+def _state_subnet_route_tables(ctx, ids):
+    route_tables = {route_table["id"]: route_table for route_table in ctx.state.get("aws_route_table", [])}
+    found = {subnet_id: None for subnet_id in ids}
+    for association in ctx.state.get("aws_route_table_association", []):
+        route_table = route_tables.get(association.get("route_table_id"))
+        if association.get("subnet_id") in found and route_table is not None:
+            found[association["subnet_id"]] = _state_route_table(route_table, ctx.state)
+    return found
+
+
+def _state_permission(rule):
+    permission = {
+        "IpProtocol": rule.get("protocol"),
+        "IpRanges": [{"CidrIp": cidr} for cidr in rule.get("cidr_blocks") or []],
+    }
+    # describe_security_groups leaves the ports out of all-protocol rules
+    if rule.get("protocol") != "-1":
+        permission["FromPort"] = rule.get("from_port")
+        permission["ToPort"] = rule.get("to_port")
+    return permission
+
+
+def _state_security_group(security_group, state):
+    return {
+        "GroupId": security_group["id"],
+        "VpcId": security_group.get("vpc_id"),
+        "IpPermissions": [_state_permission(rule) for rule in security_group.get("ingress") or []],
+        "IpPermissionsEgress": [_state_permission(rule) for rule in security_group.get("egress") or []],
+    }
+
+
+def _state_instance(instance, state):
+    return {
+        "InstanceId": instance["id"],
+        "ImageId": instance.get("ami"),
+        "InstanceType": instance.get("instance_type"),
+        "State": {"Name": instance.get("instance_state")},
+        "SecurityGroups": [{"GroupId": group_id} for group_id in instance.get("vpc_security_group_ids") or []],
+        "SubnetId": instance.get("subnet_id"),
+        "PublicIpAddress": instance.get("public_ip"),
+    }
+
+
+STATE_FETCHERS = {
+    "vpc": _from_state("aws_vpc", _state_vpc),
+    "subnet": _from_state("aws_subnet", _state_subnet),
+    "internet_gateway": _from_state("aws_internet_gateway", _state_internet_gateway),
+    "route_table": _from_state("aws_route_table", _state_route_table),
+    "security_group": _from_state("aws_security_group", _state_security_group),
+    "instance": _from_state("aws_instance", _state_instance),
+    "subnet_route_table": _state_subnet_route_tables,
+}
@@ -0,0 +1,209 @@
+"""Expected values compiled from a lab's reference solution.
+
+``python3 -m grading.golden build`` parses ``solution/*.tf`` and writes
+``golden.json`` next to the lab's ``autograder.py``.  The manifest maps each
+output to the resource behind it and holds that resource's literal
+attributes, keyed by address.  Solutions that take values from variables
+resolve them from ``solution/golden.tfvars``, which holds the values the lab
+document asks for.  References to another resource's literal attribute
+(``aws_eks_cluster.eks.name``) are resolved.  Anything only known after
+apply (IDs, ARNs) is left out.
+
+The grader loads the manifest once with :func:`load` and reads expected
+values from it instead of repeating the solution's literals::
+
+    GOLDEN.value("eks_node_group_id", "scaling_config.desired_size")  # -> 2
+
+``python3 -m grading.golden check`` recompiles the solution and fails if
+``golden.json`` is out of date.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+from . import config
+
+GOLDEN_TFVARS = "golden.tfvars"
+MANIFEST = "golden.json"
+
+_REFERENCE = re.compile(r"([a-z][a-z0-9_]*)\.([A-Za-z_][A-Za-z0-9_-]*)\.([A-Za-z_][A-Za-z0-9_]*)")
+_CONVERSION = re.compile(r"(tomap|tolist|toset)\((.*)\)")
+_TEMPLATE = re.compile(r"\$\{([^{}]*)\}")
+
+
+class _Unresolved(Exception):
+    pass
+
+
+def _resolve(value, variables, raw_resources, seen=()):
+    if isinstance(value, config.Expression):
+        match = _CONVERSION.fullmatch(value)
+        if match:
+            try:
+                inner = config.parse_attribute(match.group(2))
+            except config.ConfigError:
+                raise _Unresolved(value)
+            return _resolve(inner, variables, raw_resources, seen)
+        if value.startswith("var."):
+            if value[4:] not in variables:
+                raise _Unresolved(value)
+            return variables[value[4:]]
+        match = _REFERENCE.fullmatch(value)
+        if match:
+            address = f"{match.group(1)}.{match.group(2)}"
+            attributes = raw_resources.get(address, {})
+            if address in seen or match.group(3) not in attributes:
+                raise _Unresolved(value)
+            return _resolve(attributes[match.group(3)], variables, raw_resources, seen + (address,))
+        raise _Unresolved(value)
+    if isinstance(value, str) and "${" in value:
+        match = _TEMPLATE.fullmatch(value)
+        if not match:
+            raise _Unresolved(value)
+        return _resolve(config.Expression(match.group(1).replace(" ", "")), variables, raw_resources, seen)
+    if isinstance(value, list):
+        return [_resolve(item, variables, raw_resources, seen) for item in value]
+    if isinstance(value, dict):
+        return _resolve_attributes(value, variables, raw_resources, seen)
+    return value
+
+
+def _resolve_attributes(attributes, variables, raw_resources, seen=()):
+    resolved = {}
+    for name, value in attributes.items():
+        if name == "depends_on":
+            continue
+        try:
+            resolved[name] = _resolve(value, variables, raw_resources, seen)
+        except _Unresolved:
+            pass
+    return resolved
+
+
+def compile_solution(solution_dir, lab=None):
+    """Compile a solution directory into a manifest dict."""
+    variables = {}
+    tfvars_path = os.path.join(solution_dir, GOLDEN_TFVARS)
+    if os.path.exists(tfvars_path):
+        with open(tfvars_path) as f:
+            variables = config.parse_tfvars(f.read())
+
+    raw_resources, raw_outputs, region = {}, {}, None
+    for path in sorted(glob.glob(os.path.join(solution_dir, "*.tf"))):
+        with open(path) as f:
+            for block_type, labels, attributes in config.parse_blocks(f.read()):
+                if block_type == "resource" and len(labels) == 2:
+                    raw_resources[".".join(labels)] = attributes
+                elif block_type == "output" and labels:
+                    raw_outputs[labels[0]] = attributes.get("value")
+                elif block_type == "provider" and labels == ["aws"] and "alias" not in attributes:
+                    try:
+                        region = _resolve(attributes.get("region"), variables, raw_resources)
+                    except _Unresolved:
+                        pass
+
+    outputs = {}
+    for name, value in raw_outputs.items():
+        match = _REFERENCE.fullmatch(value) if isinstance(value, config.Expression) else None
+        if match:
+            outputs[name] = f"{match.group(1)}.{match.group(2)}"
+
+    # Checks find their resource through an output, so nothing else is kept
+    return {
+        "lab": lab,
+        "provider_region": region,
+        "resources": {address: _resolve_attributes(raw_resources[address], variables, raw_resources) for address in sorted(set(outputs.values())) if address in raw_resources},
+        "outputs": dict(sorted(outputs.items())),
+    }
+
+
+class Manifest:
+    def __init__(self, data):
+        self.data = data
+        self.provider_region = data.get("provider_region")
+
+    def resource(self, address):
+        return self.data["resources"][address]
+
+    def for_output(self, output_name):
+        """The expected attributes of the resource behind a Terraform output."""
+        return self.resource(self.data["outputs"][output_name])
+
+    def value(self, output_name, path):
+        """An expected attribute by dotted path; nested blocks use their first entry."""
+        value = self.for_output(output_name)
+        for part in path.split("."):
+            if isinstance(value, list) and not part.isdigit():
+                value = value[0]
+            value = value[int(part)] if isinstance(value, list) else value[part]
+        return value
+
+
+def diff(actual, expected, path=""):
+    """Return [(path, actual, expected)] for every expected leaf actual differs on.
+
+    Only keys present in ``expected`` are compared, so a planned or described
+    resource can be diffed against the manifest directly.
+    """
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return [(path, actual, expected)]
+        differences = []
+        for key, value in expected.items():
+            differences += diff(actual.get(key), value, f"{path}.{key}" if path else key)
+        return differences
+    if isinstance(expected, list) and expected and isinstance(expected[0], dict):
+        # A nested block: compare entry by entry
+        if not isinstance(actual, list) or len(actual) != len(expected):
+            return [(path, actual, expected)]
+        differences = []
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            differences += diff(a, e, f"{path}.{i}")
+        return differences
+    return [] if actual == expected else [(path, actual, expected)]
+
+
+_loaded = {}
+
+
+def load(path):
+    """Load a manifest once per process."""
+    if path not in _loaded:
+        with open(path) as f:
+            _loaded[path] = Manifest(json.load(f))
+    return _loaded[path]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile a lab solution into golden.json.")
+    parser.add_argument("command", choices=["build", "check"])
+    parser.add_argument("--solution", default="../../solution", help="solution directory (default: ../../solution)")
+    parser.add_argument("--output", default=MANIFEST, help=f"manifest path (default: {MANIFEST})")
+    parser.add_argument("--lab", help="lab name (default: the solution's parent directory)")
+    args = parser.parse_args(argv)
+    args.lab = args.lab or os.path.basename(os.path.abspath(os.path.join(args.solution, "..")))
+
+    manifest = json.dumps(compile_solution(args.solution, args.lab), indent=2) + "\n"
+    if args.command == "build":
+        with open(args.output, 'w') as f:
+            f.write(manifest)
+        print(f"Wrote {args.output}")
+        return 0
+
+    try:
+        with open(args.output) as f:
+            current = f.read()
+    except FileNotFoundError:
+        current = None
+    if current != manifest:
+        print(f"{args.output} is out of date; run `python3 -m grading.golden build`.")
+        return 1
+    print(f"{args.output} is up to date.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
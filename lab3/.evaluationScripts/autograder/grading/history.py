@@ -0,0 +1,220 @@
+"""Grading history in SQLite, one row per run and one per check result.
+
+``evaluate.json`` only holds the latest grade.  When ``GRADER_HISTORY_DB``
+names a database file, :func:`engine.main` also records every run here with
+its durations, AWS call counts and a hash of the submitted files, so failure
+rates and grading latency can be queried for a lab, a check or a student.
+
+    python3 -m grading.history report [--db FILE] [--lab lab2] [--days 30]
+    python3 -m grading.history runs --student ID
+
+Writes are a single short transaction in WAL mode, so graders running side by
+side in one container can share the database.
+"""
+import argparse
+import glob
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+
+SUBMISSION_PATTERNS = ("*.tf", "*.tfvars", "*.sh")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    lab TEXT NOT NULL,
+    student TEXT,
+    submission_hash TEXT,
+    started_at REAL NOT NULL,
+    duration REAL,
+    setup_duration REAL,
+    status TEXT,
+    score INTEGER,
+    max_score INTEGER,
+    aws_calls INTEGER,
+    aws_cache_hits INTEGER
+);
+CREATE TABLE IF NOT EXISTS checks (
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    seq INTEGER NOT NULL,
+    testid TEXT NOT NULL,
+    status TEXT NOT NULL,
+    score INTEGER,
+    max_score INTEGER,
+    duration REAL,
+    aws_calls INTEGER,
+    message TEXT,
+    PRIMARY KEY (run_id, seq)
+);
+CREATE INDEX IF NOT EXISTS runs_lab ON runs(lab, started_at);
+CREATE INDEX IF NOT EXISTS runs_student ON runs(student, started_at);
+CREATE INDEX IF NOT EXISTS runs_submission ON runs(submission_hash);
+CREATE INDEX IF NOT EXISTS checks_testid ON checks(testid, status);
+"""
+
+
+def submission_hash(directory=".", exclude=(), extra=()):
+    """SHA-256 over the names and contents of the submitted Terraform files.
+
+    ``extra`` adds file patterns, such as the state a lab grades as submitted.
+    """
+    digest = hashlib.sha256()
+    paths = set()
+    for pattern in SUBMISSION_PATTERNS + tuple(extra):
+        paths.update(glob.glob(os.path.join(directory, pattern)))
+    for path in sorted(paths):
+        name = os.path.basename(path)
+        if name in exclude:
+            continue
+        digest.update(name.encode() + b"\0")
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def record(path, run, results, check_stats=None):
+    """Store a run (a dict of ``runs`` columns) and its result dicts.
+
+    ``check_stats`` maps a result's position (``seq``, from 1) to its
+    ``(duration, AWS calls)``.
+    """
+    check_stats = check_stats or {}
+    rows = []
+    for seq, result in enumerate(results, 1):
+        duration, aws_calls = check_stats.get(seq, (None, None))
+        rows.append((run["run_id"], seq, result["testid"], result["status"], result["score"], result["maximum marks"], duration, aws_calls, result["message"]))
+
+    run = dict(run, score=sum(r["score"] for r in results), max_score=sum(r["maximum marks"] for r in results))
+    columns = ", ".join(run)
+    placeholders = ", ".join("?" for _ in run)
+
+    conn = connect(path)
+    try:
+        with conn:
+            # A re-run with the same GRADER_RUN_ID replaces the earlier rows
+            conn.execute("DELETE FROM checks WHERE run_id = ?", (run["run_id"],))
+            conn.execute(f"INSERT OR REPLACE INTO runs ({columns}) VALUES ({placeholders})", list(run.values()))
+            conn.executemany("INSERT INTO checks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    finally:
+        conn.close()
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty."""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
+
+
+def _filters(lab=None, student=None, days=None):
+    clauses, params = [], []
+    if lab:
+        clauses.append("runs.lab = ?")
+        params.append(lab)
+    if student:
+        clauses.append("runs.student = ?")
+        params.append(student)
+    if days:
+        clauses.append("runs.started_at >= ?")
+        params.append(time.time() - days * 86400)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def check_report(conn, lab=None, student=None, days=None):
+    """Per (lab, testid): runs, failure rate and duration percentiles."""
+    where, params = _filters(lab, student, days)
+    groups = {}
+    query = f"SELECT runs.lab, checks.testid, checks.status, checks.duration FROM checks JOIN runs USING (run_id){where}"
+    for lab_name, testid, status, duration in conn.execute(query, params):
+        group = groups.setdefault((lab_name, testid), {"runs": 0, "failures": 0, "durations": []})
+        group["runs"] += 1
+        group["failures"] += status != "success"
+        group["durations"].append(duration)
+
+    report = []
+    for (lab_name, testid), group in sorted(groups.items(), key=lambda item: -item[1]["failures"] / item[1]["runs"]):
+        report.append({
+            "lab": lab_name,
+            "testid": testid,
+            "runs": group["runs"],
+            "failure_rate": group["failures"] / group["runs"],
+            "p50": percentile(group["durations"], 50),
+            "p90": percentile(group["durations"], 90),
+            "p99": percentile(group["durations"], 99),
+        })
+    return report
+
+
+def run_report(conn, lab=None, student=None, days=None):
+    """Per lab: runs, full-marks rate and run duration percentiles."""
+    where, params = _filters(lab, student, days)
+    groups = {}
+    query = f"SELECT lab, score, max_score, duration FROM runs{where}"
+    for lab_name, score, max_score, duration in conn.execute(query, params):
+        group = groups.setdefault(lab_name, {"runs": 0, "full": 0, "durations": []})
+        group["runs"] += 1
+        group["full"] += bool(max_score) and score == max_score
+        group["durations"].append(duration)
+
+    return [{
+        "lab": lab_name,
+        "runs": group["runs"],
+        "full_marks_rate": group["full"] / group["runs"],
+        "p50": percentile(group["durations"], 50),
+        "p90": percentile(group["durations"], 90),
+        "p99": percentile(group["durations"], 99),
+    } for lab_name, group in sorted(groups.items())]
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value:.1f}s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the grading history.")
+    parser.add_argument("command", choices=["report", "runs"])
+    parser.add_argument("--db", default=os.environ.get("GRADER_HISTORY_DB"), help="history database (default: $GRADER_HISTORY_DB)")
+    parser.add_argument("--lab")
+    parser.add_argument("--student")
+    parser.add_argument("--days", type=float, help="only runs started in the last DAYS days")
+    parser.add_argument("--limit", type=int, default=20, help="number of runs listed by `runs`")
+    args = parser.parse_args(argv)
+
+    if not args.db or not os.path.exists(args.db):
+        print("No history database; pass --db or set GRADER_HISTORY_DB.")
+        return 1
+    conn = connect(args.db)
+    try:
+        if args.command == "report":
+            print("lab\truns\tfull marks\tp50\tp90\tp99")
+            for row in run_report(conn, args.lab, args.student, args.days):
+                print(f"{row['lab']}\t{row['runs']}\t{row['full_marks_rate']:.0%}\t{_seconds(row['p50'])}\t{_seconds(row['p90'])}\t{_seconds(row['p99'])}")
+            print()
+            print("lab\tcheck\truns\tfailure rate\tp50\tp90\tp99")
+            for row in check_report(conn, args.lab, args.student, args.days):
+                print(f"{row['lab']}\t{row['testid']}\t{row['runs']}\t{row['failure_rate']:.0%}\t{_seconds(row['p50'])}\t{_seconds(row['p90'])}\t{_seconds(row['p99'])}")
+        else:
+            where, params = _filters(args.lab, args.student, args.days)
+            query = f"SELECT run_id, lab, student, started_at, status, score, max_score, duration, submission_hash FROM runs{where} ORDER BY started_at DESC LIMIT ?"
+            for run_id, lab, student, started_at, status, score, max_score, duration, submission in conn.execute(query, params + [args.limit]):
+                started = time.strftime("%Y-%m-%d %H:%M", time.localtime(started_at))
+                print(f"{started}\t{run_id}\t{lab}\t{student or '-'}\t{status}\t{score}/{max_score}\t{_seconds(duration)}\t{(submission or '')[:12]}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""Tear down resources left behind by grading runs that never cleaned up.
+
+Orphans are discovered with a single paginated Resource Groups Tagging API
+query for the run-ID tag written by ``grading.tags``, instead of one
+``describe_*`` call per resource type.  They are then deleted tier by tier in
+dependency order (node groups, clusters, instances, routing, subnets and
+security groups, VPCs), with bounded parallelism inside each tier.  Anything
+that still has dependents is left for the next sweep.
+
+With ``max_wait=0`` deletions are requested without waiting for them to
+complete, and ``budget`` stops a sweep from starting further tiers once it
+has run that many seconds; the sweep ``evaluate.sh`` runs after its
+``terraform destroy`` (``engine.sweep``) uses both, with the grader's
+bounded client timeouts (``client_config``).
+
+Usage::
+
+    python3 -m grading.janitor [--region REGION] [--all] [--run-id ID] [--dry-run]
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import tags
+
+DEFAULT_WORKERS = 8
+
+# Deletion order; every kind in a tier is deleted before the next tier starts.
+TIERS = [
+    ("nodegroup",),
+    ("cluster",),
+    ("instance",),
+    ("route-table", "internet-gateway"),
+    ("subnet", "security-group"),
+    ("vpc",),
+]
+
+
+class Orphan:
+    def __init__(self, arn, kind, resource_id, run_id, expires_at):
+        self.arn = arn
+        self.kind = kind
+        self.resource_id = resource_id
+        self.run_id = run_id
+        self.expires_at = expires_at
+
+
+def parse_arn(arn):
+    """Return (kind, resource id) for the ARN formats the graders create."""
+    resource = arn.split(":", 5)[5]
+    kind, _, resource_id = resource.partition("/")
+    if kind == "nodegroup":
+        # nodegroup/<cluster>/<nodegroup>/<uuid>
+        cluster, nodegroup = resource_id.split("/")[:2]
+        resource_id = (cluster, nodegroup)
+    return kind, resource_id
+
+
+def discover(session, run_id=None, include_unexpired=False, now=None, client_config=None):
+    """Return the tagged resources that are due for deletion."""
+    now = time.time() if now is None else now
+    tag_filter = {"Key": tags.RUN_ID_TAG}
+    if run_id:
+        tag_filter["Values"] = [run_id]
+
+    client = session.client("resourcegroupstaggingapi", config=client_config)
+    orphans = []
+    for page in client.get_paginator("get_resources").paginate(TagFilters=[tag_filter]):
+        for mapping in page["ResourceTagMappingList"]:
+            tag_map = {tag["Key"]: tag["Value"] for tag in mapping.get("Tags", [])}
+            expires_at = tags.parse_expiry(tag_map.get(tags.EXPIRES_TAG))
+            if not include_unexpired and expires_at is not None and expires_at > now:
+                continue
+            kind, resource_id = parse_arn(mapping["ResourceARN"])
+            orphans.append(Orphan(mapping["ResourceARN"], kind, resource_id, tag_map.get(tags.RUN_ID_TAG), expires_at))
+    return orphans
+
+
+def _waiter_config(max_wait):
+    return {"Delay": 15, "MaxAttempts": max(1, int(max_wait // 15))}
+
+
+def _delete_nodegroup(eks, orphans, max_wait):
+    for orphan in orphans:
+        cluster, nodegroup = orphan.resource_id
+        eks.delete_nodegroup(clusterName=cluster, nodegroupName=nodegroup)
+    if not max_wait:
+        return
+    for orphan in orphans:
+        cluster, nodegroup = orphan.resource_id
+        eks.get_waiter("nodegroup_deleted").wait(clusterName=cluster, nodegroupName=nodegroup, WaiterConfig=_waiter_config(max_wait))
+
+
+def _delete_cluster(eks, orphans, max_wait):
+    for orphan in orphans:
+        eks.delete_cluster(name=orphan.resource_id)
+    if not max_wait:
+        return
+    for orphan in orphans:
+        eks.get_waiter("cluster_deleted").wait(name=orphan.resource_id, WaiterConfig=_waiter_config(max_wait))
+
+
+def _delete_instance(ec2, orphans, max_wait):
+    instance_ids = [orphan.resource_id for orphan in orphans]
+    ec2.terminate_instances(InstanceIds=instance_ids)
+    if max_wait:
+        ec2.get_waiter("instance_terminated").wait(InstanceIds=instance_ids, WaiterConfig=_waiter_config(max_wait))
+
+
+def _delete_route_table(ec2, orphans, max_wait):
+    for orphan in orphans:
+        route_table = ec2.describe_route_tables(RouteTableIds=[orphan.resource_id])["RouteTables"][0]
+        for association in route_table.get("Associations", []):
+            if not association.get("Main"):
+                ec2.disassociate_route_table(AssociationId=association["RouteTableAssociationId"])
+        ec2.delete_route_table(RouteTableId=orphan.resource_id)
+
+
+def _delete_internet_gateway(ec2, orphans, max_wait):
+    for orphan in orphans:
+        igw = ec2.describe_internet_gateways(InternetGatewayIds=[orphan.resource_id])["InternetGateways"][0]
+        for attachment in igw.get("Attachments", []):
+            ec2.detach_internet_gateway(InternetGatewayId=orphan.resource_id, VpcId=attachment["VpcId"])
+        ec2.delete_internet_gateway(InternetGatewayId=orphan.resource_id)
+
+
+def _delete_subnet(ec2, orphans, max_wait):
+    for orphan in orphans:
+        ec2.delete_subnet(SubnetId=orphan.resource_id)
+
+
+def _delete_security_group(ec2, orphans, max_wait):
+    for orphan in orphans:
+        ec2.delete_security_group(GroupId=orphan.resource_id)
+
+
+def _delete_vpc(ec2, orphans, max_wait):
+    for orphan in orphans:
+        ec2.delete_vpc(VpcId=orphan.resource_id)
+
+
+# kind -> (service, deleter); each deleter gets that service's client
+DELETERS = {
+    "nodegroup": ("eks", _delete_nodegroup),
+    "cluster": ("eks", _delete_cluster),
+    "instance": ("ec2", _delete_instance),
+    "route-table": ("ec2", _delete_route_table),
+    "internet-gateway": ("ec2", _delete_internet_gateway),
+    "subnet": ("ec2", _delete_subnet),
+    "security-group": ("ec2", _delete_security_group),
+    "vpc": ("ec2", _delete_vpc),
+}
+
+# Instances are terminated with one batched call; everything else is deleted
+# one resource per task.
+BATCHED = {"instance"}
+
+
+def teardown(session, orphans, max_workers=DEFAULT_WORKERS, max_wait=600, budget=None, client_config=None):
+    """Delete orphans in dependency order and return (deleted, failed) ARNs."""
+    stop_at = None if budget is None else time.monotonic() + budget
+    deleted, failed = [], []
+    by_kind = {}
+    for orphan in orphans:
+        by_kind.setdefault(orphan.kind, []).append(orphan)
+    # Sessions are not thread-safe but clients are, so the workers share
+    # clients created here
+    services = {DELETERS[kind][0] for kind in by_kind if kind in DELETERS}
+    clients = {service: session.client(service, config=client_config) for service in services}
+
+    for tier in TIERS:
+        if stop_at is not None and time.monotonic() >= stop_at:
+            for kind in tier:
+                failed.extend((orphan.arn, "not attempted, the sweep ran out of time") for orphan in by_kind.pop(kind, []))
+            continue
+        batches = []
+        for kind in tier:
+            group = by_kind.pop(kind, [])
+            if not group:
+                continue
+            if kind in BATCHED:
+                batches.append((kind, group))
+            else:
+                batches.extend((kind, [orphan]) for orphan in group)
+        if not batches:
+            continue
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = []
+            for kind, group in batches:
+                service, deleter = DELETERS[kind]
+                futures.append((group, pool.submit(deleter, clients[service], group, max_wait)))
+            for group, future in futures:
+                try:
+                    future.result()
+                    deleted.extend(orphan.arn for orphan in group)
+                except Exception as e:
+                    failed.extend((orphan.arn, str(e)) for orphan in group)
+
+    for group in by_kind.values():
+        failed.extend((orphan.arn, "unsupported resource type") for orphan in group)
+    return deleted, failed
+
+
+def sweep(session, run_id=None, include_unexpired=False, dry_run=False, max_workers=DEFAULT_WORKERS, max_wait=600, budget=None, client_config=None):
+    """Discover and delete orphaned grader resources; returns a summary dict."""
+    orphans = discover(session, run_id=run_id, include_unexpired=include_unexpired, client_config=client_config)
+    summary = {"found": [orphan.arn for orphan in orphans], "deleted": [], "failed": []}
+    if orphans and not dry_run:
+        summary["deleted"], summary["failed"] = teardown(session, orphans, max_workers, max_wait, budget, client_config)
+    return summary
+
+
+def main(argv=None):
+    import boto3
+
+    parser = argparse.ArgumentParser(prog="python3 -m grading.janitor", description=__doc__.splitlines()[0])
+    parser.add_argument("--region", help="AWS region to sweep (default: from the AWS configuration)")
+    parser.add_argument("--run-id", help="only sweep resources of this grading run")
+    parser.add_argument("--all", action="store_true", help="also sweep resources that have not expired yet")
+    parser.add_argument("--dry-run", action="store_true", help="list orphans without deleting them")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="parallel deletions per tier")
+    args = parser.parse_args(argv)
+
+    session = boto3.Session(region_name=args.region)
+    summary = sweep(session, run_id=args.run_id, include_unexpired=args.all, dry_run=args.dry_run, max_workers=args.workers)
+    for arn in summary["found"]:
+        print(f"found    {arn}")
+    for arn in summary["deleted"]:
+        print(f"deleted  {arn}")
+    for arn, error in summary["failed"]:
+        print(f"failed   {arn}: {error}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Reading Terraform state and plans for the graders (variables: ``grading.config``)."""
+import json
+import os
+
+from . import timeouts
+
+STATE_FILE = "terraform.tfstate"
+
+def read_outputs(state_file_path=STATE_FILE):
+    """Return the root module outputs of the state file as ``{name: value}``."""
+    if not os.path.exists(state_file_path):
+        raise FileNotFoundError("Terraform state file not found.")
+
+    with open(state_file_path, 'r') as f:
+        terraform_state = json.load(f)
+
+    return {name: output["value"] for name, output in terraform_state.get('outputs', {}).items()}
+
+
+def plan_resources(deadline, stage_budgets, plan_file="grader.tfplan"):
+    """Plan the configuration and return planned values by resource type.
+
+    Only the first resource of each type is kept, which is all the labs use.
+    """
+    timeouts.run(["terraform", "init", "-input=false"], deadline, "terraform init", stage_budgets.get("init"), check=True, capture_output=True)
+    timeouts.run(
+        ["terraform", "plan", "-input=false", "-lock=false", "-refresh=false", f"-out={plan_file}"],
+        deadline,
+        "terraform plan",
+        stage_budgets.get("plan"),
+        check=True,
+        capture_output=True
+    )
+    plan = timeouts.check_output(["terraform", "show", "-json", plan_file], deadline, "terraform show", stage_budgets.get("plan"))
+    os.remove(plan_file)
+
+    planned = {}
+    for resource in json.loads(plan).get("planned_values", {}).get("root_module", {}).get("resources", []):
+        planned.setdefault(resource["type"], resource.get("values") or {})
+    return planned
+
+
+def _module_resources(module):
+    yield from module.get("resources", [])
+    for child in module.get("child_modules", []):
+        yield from _module_resources(child)
+
+
+def refresh_state(deadline, stage_budgets, plan_file="grader-refresh.tfplan"):
+    """Run a refresh-only plan of the applied configuration.
+
+    Returns ``(in_sync, resources)``: whether the refresh found no drift
+    (``-detailed-exitcode`` 0 rather than 2) and the refreshed state's
+    managed resource values as ``{type: [values, ...]}``.  Terraform
+    refreshes the resources in parallel, so this is one consistent read of
+    everything the submission created.
+    """
+    try:
+        proc = timeouts.run(
+            ["terraform", "plan", "-refresh-only", "-input=false", "-lock=false", "-detailed-exitcode", f"-out={plan_file}"],
+            deadline,
+            "terraform plan",
+            stage_budgets.get("plan"),
+            check=True,
+            capture_output=True,
+            ok_returncodes=(0, 2)
+        )
+        plan = timeouts.check_output(["terraform", "show", "-json", plan_file], deadline, "terraform show", stage_budgets.get("plan"))
+    finally:
+        if os.path.exists(plan_file):
+            os.remove(plan_file)
+
+    resources = {}
+    for resource in _module_resources(json.loads(plan).get("prior_state", {}).get("values", {}).get("root_module", {})):
+        if resource.get("mode") == "managed":
+            resources.setdefault(resource["type"], []).append(resource.get("values") or {})
+    return proc.returncode == 0, resources
@@ -5,23 +5,44 @@ INSTRUCTOR_SCRIPTS="/home/.evaluationScripts"
 # INSTRUCTOR_SCRIPTS="."
 LAB_DIRECTORY="../labDirectory"
 
+# Grading budget in seconds; the grader stops itself when it runs out and the
+# outer timeout is only a backstop in case it hangs
+export GRADER_BUDGET="${GRADER_BUDGET:-900}"
+
 
 ptcd=$(pwd)
 
 cd $INSTRUCTOR_SCRIPTS
 # echo $ptcd
 
-list_of_files="$(ls $LAB_DIRECTORY)"
-
-
-cp -r $LAB_DIRECTORY/* autograder/
-
-cd ./autograder/
-
-chmod -R 777 $list_of_files
-
-./grader.sh
-
-rm -r $list_of_files
-
-cd "$ptcd"
\ No newline at end of file
+# Terraform only needs the configuration, the variables and the state the
+# student applied. Link those into a workspace instead of copying the whole
+# lab directory next to the grader. The workspace is keyed by the hash of
+# the submission and its state, so a run that was interrupted resumes from
+# its checkpoint the next time the same files and state are graded
+export GRADER_WORKSPACE_ROOT="${GRADER_WORKSPACE_ROOT:-${TMPDIR:-/tmp}/grader-workspaces}"
+# Workspaces of runs that were never resumed. The state in them is a link to
+# the student's own, so removing them leaves the student's resources alone
+if [ -d "$GRADER_WORKSPACE_ROOT" ]; then
+    find "$GRADER_WORKSPACE_ROOT" -mindepth 1 -maxdepth 1 -type d -mmin +$(( ${GRADER_RESOURCE_TTL:-7200} / 60 )) -exec rm -rf {} +
+fi
+LAB_PATH="$(realpath "$LAB_DIRECTORY")"
+WORKSPACE="$(cd autograder && python3 -m grading.checkpoint workspace --extra terraform.tfstate "$LAB_PATH")"
+for file in "$LAB_DIRECTORY"/*.tf "$LAB_DIRECTORY"/*.tfvars "$LAB_DIRECTORY"/*.sh "$LAB_DIRECTORY"/terraform.tfstate; do
+    if [ -f "$file" ]; then
+        ln -sf "$(realpath "$file")" "$WORKSPACE/"
+    fi
+done
+
+export GRADER_EVALUATE_PATH="$(pwd)/evaluate.json"
+export GRADER_HISTORY_DB="${GRADER_HISTORY_DB-$(pwd)/grading_history.sqlite3}"
+
+cd "$WORKSPACE"
+
+timeout --signal=TERM --kill-after=60 $((GRADER_BUDGET + 120)) "$INSTRUCTOR_SCRIPTS/autograder/grader.sh"
+
+# A run that did not finish keeps its workspace for the next run to resume
+cd "$ptcd"
+if (cd "$INSTRUCTOR_SCRIPTS/autograder" && python3 -m grading.checkpoint finished "$WORKSPACE"); then
+    rm -rf "$WORKSPACE"
+fi
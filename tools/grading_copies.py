@@ -0,0 +1,64 @@
+"""Keep the per-lab copies of the ``grading`` package identical.
+
+Each lab ships as its own container, so lab1, lab2 and lab3 each carry a copy
+of ``grading`` next to their ``autograder.py``.  lab1's copy is the one to
+edit; ``sync`` copies it over the others and ``check`` fails if any copy
+differs from it, listing the files that do.
+
+    python3 tools/grading_copies.py check
+    python3 tools/grading_copies.py sync
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LABS = ["lab1", "lab2", "lab3"]
+SOURCE = LABS[0]
+
+
+def package_dir(lab):
+    return os.path.join(REPO, lab, ".evaluationScripts", "autograder", "grading")
+
+
+def _modules(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".py"))
+
+
+def differences(lab):
+    """Files of ``lab``'s copy that are missing, extra or different from the source copy."""
+    source, copy = package_dir(SOURCE), package_dir(lab)
+    expected, found = _modules(source), _modules(copy)
+    missing = [name for name in expected if name not in found]
+    extra = [name for name in found if name not in expected]
+    changed = [name for name in expected if name in found and not filecmp.cmp(os.path.join(source, name), os.path.join(copy, name), shallow=False)]
+    return missing, extra, changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or sync the per-lab copies of the grading package.")
+    parser.add_argument("command", choices=["check", "sync"])
+    args = parser.parse_args(argv)
+
+    status = 0
+    for lab in LABS[1:]:
+        missing, extra, changed = differences(lab)
+        if args.command == "sync":
+            for name in missing + changed:
+                shutil.copyfile(os.path.join(package_dir(SOURCE), name), os.path.join(package_dir(lab), name))
+            for name in extra:
+                os.remove(os.path.join(package_dir(lab), name))
+            continue
+        for label, names in (("missing", missing), ("extra", extra), ("differs", changed)):
+            for name in names:
+                print(f"{lab}/.evaluationScripts/autograder/grading/{name}: {label}")
+                status = 1
+    if args.command == "check":
+        print(f"grading copies differ from {SOURCE}'s; run `python3 tools/grading_copies.py sync`." if status else "grading copies are identical.")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())